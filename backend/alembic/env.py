@@ -8,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.database.database import Base
 from app.models.url import URL
+from app.models.url_click import URLClick
 from app.core.config import settings
 
 config = context.config
@@ -0,0 +1,93 @@
+"""add long_url_hash digest and move long URL uniqueness onto it
+
+Revision ID: a8c6d2f4e1b7
+Revises: e5f7a9c1b3d8
+Create Date: 2026-10-17 14:22:10.385129
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c6d2f4e1b7'
+down_revision = 'e5f7a9c1b3d8'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+# SHA-256 of the exact long URL string, whatever NORMALIZE_LONG_URLS is set to: existing
+# rows were deduplicated on that string, so these digests are as unique as the old index
+DIGEST = "sha256(convert_to({}, 'UTF8'))"
+
+# Fills the digest for inserts from app versions that predate the column, which keep
+# running during a rolling deploy; rows that carry a digest are left as they are
+FILL_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION urls_fill_long_url_hash() RETURNS trigger AS $$
+BEGIN
+    IF NEW.long_url_hash IS NULL THEN
+        NEW.long_url_hash := {DIGEST.format('NEW.long_url')};
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def backfill(conn) -> None:
+    """Hash the rows still missing a digest, in committed batches so no long transaction locks the table"""
+    while True:
+        result = conn.execute(
+            sa.text(
+                f"UPDATE urls SET long_url_hash = {DIGEST.format('long_url')} "
+                "WHERE id IN (SELECT id FROM urls WHERE long_url_hash IS NULL LIMIT :batch)"
+            ),
+            {"batch": BACKFILL_BATCH_SIZE}
+        )
+        if result.rowcount == 0:
+            return
+
+
+def upgrade() -> None:
+    op.add_column('urls', sa.Column('long_url_hash', sa.LargeBinary(), nullable=True))
+    op.execute(FILL_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER urls_fill_long_url_hash BEFORE INSERT OR UPDATE OF long_url ON urls "
+        "FOR EACH ROW EXECUTE FUNCTION urls_fill_long_url_hash()"
+    )
+
+    conn = op.get_bind()
+    with op.get_context().autocommit_block():
+        backfill(conn)
+
+        duplicates = conn.execute(sa.text(
+            "SELECT count(*) FROM (SELECT 1 FROM urls GROUP BY long_url_hash HAVING count(*) > 1) AS d"
+        )).scalar()
+        if duplicates:
+            raise RuntimeError(f"{duplicates} long_url_hash values are shared by several rows; resolve them before upgrading")
+
+        # A failed earlier run may have left an INVALID index behind
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_urls_long_url_hash")
+        op.create_index(op.f('ix_urls_long_url_hash'), 'urls', ['long_url_hash'], unique=True, postgresql_concurrently=True)
+
+        # The trigger covers every insert since the column was added; this catches any row it did not
+        backfill(conn)
+        # A validated CHECK lets SET NOT NULL skip its full-table scan under an exclusive lock
+        op.execute("ALTER TABLE urls ADD CONSTRAINT urls_long_url_hash_not_null CHECK (long_url_hash IS NOT NULL) NOT VALID")
+        op.execute("ALTER TABLE urls VALIDATE CONSTRAINT urls_long_url_hash_not_null")
+
+    op.alter_column('urls', 'long_url_hash', nullable=False)
+    op.drop_constraint('urls_long_url_hash_not_null', 'urls', type_='check')
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_urls_long_url', table_name='urls', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_urls_long_url', 'urls', ['long_url'], unique=True, postgresql_concurrently=True)
+        op.drop_index(op.f('ix_urls_long_url_hash'), table_name='urls', postgresql_concurrently=True)
+    op.execute("DROP TRIGGER IF EXISTS urls_fill_long_url_hash ON urls")
+    op.execute("DROP FUNCTION IF EXISTS urls_fill_long_url_hash()")
+    op.drop_column('urls', 'long_url_hash')
@@ -0,0 +1,25 @@
+"""create url_code_seq for leased short code IDs
+
+Revision ID: b7d2e4a91c3f
+Revises: f63848c4be49
+Create Date: 2026-10-17 09:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4a91c3f'
+down_revision = 'f63848c4be49'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # INCREMENT is the lease block size; must match url_code_seq in app/models/url.py
+    op.execute(sa.schema.CreateSequence(sa.Sequence('url_code_seq', start=1, increment=1000)))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('url_code_seq')))
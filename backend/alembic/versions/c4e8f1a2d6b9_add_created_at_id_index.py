@@ -0,0 +1,27 @@
+"""add (created_at, id) index for keyset pagination
+
+Revision ID: c4e8f1a2d6b9
+Revises: b7d2e4a91c3f
+Create Date: 2026-10-17 10:31:07.218554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8f1a2d6b9'
+down_revision = 'b7d2e4a91c3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so the listing index does not block writes on a live table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_urls_created_at_id', 'urls', ['created_at', 'id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_urls_created_at_id', table_name='urls', postgresql_concurrently=True)
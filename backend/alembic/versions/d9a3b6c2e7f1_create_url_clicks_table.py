@@ -0,0 +1,29 @@
+"""create url_clicks table
+
+Revision ID: d9a3b6c2e7f1
+Revises: c4e8f1a2d6b9
+Create Date: 2026-10-17 11:48:22.904716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3b6c2e7f1'
+down_revision = 'c4e8f1a2d6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('url_clicks',
+    sa.Column('short_code', sa.String(), nullable=False),
+    sa.Column('clicks', sa.BigInteger(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('short_code')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('url_clicks')
@@ -0,0 +1,26 @@
+"""add expires_at index for the expiry sweeper
+
+Revision ID: e5f7a9c1b3d8
+Revises: d9a3b6c2e7f1
+Create Date: 2026-10-17 13:05:49.617302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f7a9c1b3d8'
+down_revision = 'd9a3b6c2e7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_urls_expires_at'), 'urls', ['expires_at'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_urls_expires_at'), table_name='urls', postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.core.config import settings
+from app.core.profiler import ProfilerBusyError, ProfilerUnavailableError, profiler
+from app.core.security import is_admin_token
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not settings.ADMIN_TOKEN:
+        # Admin endpoints do not exist until a token is configured
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+@router.get("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)], tags=["admin"])
+async def profile(
+    seconds: float = Query(10, gt=0, description="How long to sample for"),
+    every: int | None = Query(None, ge=1, description="Only sample every K-th request instead of the whole worker")
+):
+    """Sample the serving worker's CPU for `seconds` and return folded stacks
+
+    The output is one "frame;frame;... count" line per stack, readable by speedscope and
+    flamegraph.pl. Only the worker that handles this request is profiled.
+    """
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS}")
+    
+    try:
+        session = profiler.start_session(every)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ProfilerUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop_session()
+    
+    return PlainTextResponse(session.render())
@@ -1,22 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from app.schemas.url import URLCreate, URLResponse, URLListResponse
-from app.services.url_service import URLService, URLAlreadyExistsError, ShortCodeAlreadyExistsError
-from app.database.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.url import URLCreate, URLResponse, URLListResponse, URLBulkCreate, URLBulkItemResult, URLBulkResponse, URLStatsResponse
+from app.services.url_service import URLService, URLAlreadyExistsError, ShortCodeAlreadyExistsError, NoFreeShortCodeError, InvalidCursorError, BULK_CREATED
+from app.database.database import get_async_db
+from app.database.replicas import get_async_read_db, mark_read_primary
+from app.middleware.rate_limit import allow_bulk_create
 from app.core.config import settings
 
 router = APIRouter()
 
 
 @router.post("/create", response_model=URLResponse, tags=["urls"])
-def create_url(url_data: URLCreate, db: Session = Depends(get_db)):
+async def create_url(url_data: URLCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
     try:
-        url_obj = URLService.create_short_url(
+        url_obj = await URLService.create_short_url(
             db=db,
             original_url=url_data.original_url, 
             short_code=url_data.custom_alias,
             expires_in_days=url_data.expires_in_days
         )
+        mark_read_primary(response)
 
         return URLResponse(
             short_url=f"{settings.BASE_URL}/{url_obj.short_code}",
@@ -49,19 +52,55 @@ def create_url(url_data: URLCreate, db: Session = Depends(get_db)):
     except ShortCodeAlreadyExistsError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Custom alias already exists. Please choose a different one.")
     
+    except NoFreeShortCodeError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Could not allocate a free short code. Please retry.")
+    
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/bulk", response_model=URLBulkResponse, tags=["urls"])
+async def bulk_create_urls(bulk_data: URLBulkCreate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    """Create many short URLs at once; results are reported per item in input order"""
+    if not await allow_bulk_create(request, len(bulk_data.urls)):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limit exceeded for URL creation")
+
+    try:
+        outcomes = await URLService.bulk_create_short_urls(db, bulk_data.urls)
+        mark_read_primary(response)
+        
+        results = [
+            URLBulkItemResult(
+                index=index,
+                status=status_,
+                original_url=item.original_url,
+                short_url=f"{settings.BASE_URL}/{url.short_code}" if url else None,
+                expires_at=str(url.expires_at) if url and url.expires_at else None
+            )
+            for index, (item, (status_, url)) in enumerate(zip(bulk_data.urls, outcomes))
+        ]
+        created = sum(1 for result in results if result.status == BULK_CREATED)
+        
+        return URLBulkResponse(
+            results=results,
+            created=created,
+            failed=sum(1 for result in results if result.short_url is None)
+        )
+    
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {str(e)}")
 
 
 @router.get("/list", response_model=URLListResponse, tags=["urls"])
-def list_urls(
-    db: Session = Depends(get_db),
-    page: int = Query(1, ge=1, description="Page number"),
-    limit: int = Query(10, ge=1, le=50, description="Items per page")
+async def list_urls(
+    db: AsyncSession = Depends(get_async_read_db),
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is given)"),
+    limit: int = Query(10, ge=1, le=50, description="Items per page"),
+    cursor: str | None = Query(None, description="Opaque cursor from a previous page's next_cursor")
 ):
     """List all URLs with pagination"""
     try:
-        urls, total = URLService.get_urls_paginated(db, page, limit)
+        urls, total, next_cursor = await URLService.get_urls_paginated(db, page, limit, cursor)
         
         url_responses = [
             URLResponse(
@@ -77,27 +116,50 @@ def list_urls(
             total=total or len(url_responses),
             page=page,
             limit=limit,
-            total_pages=(total + limit - 1) // limit if total else 1
+            total_pages=(total + limit - 1) // limit if total else 1,
+            next_cursor=next_cursor
         )
+    
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
         
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Internal server error: {str(e)}")
 
 
+@router.get("/stats", response_model=URLStatsResponse, tags=["urls"])
+async def url_stats(
+    short_code: str = Query(..., description="Short code to report on"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Click count and last access time for a short URL (refreshed every few seconds)"""
+    stats = await URLService.get_click_stats(db, short_code)
+    if not stats:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
+    
+    return URLStatsResponse(
+        short_code=stats.short_code,
+        clicks=stats.clicks,
+        last_accessed_at=str(stats.last_accessed_at) if stats.last_accessed_at else None
+    )
+
+
 @router.delete("/delete", tags=["urls"])
-def delete_url(
+async def delete_url(
+    response: Response,
     short_code: str = Query(None, description="Short code to delete"),
     long_url: str = Query(None, description="Long URL to delete"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete URL by short code or long URL"""
     if not short_code and not long_url:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Either short_code or long_url must be provided")
     
     try:
-        deleted = URLService.delete_url(db, short_code, long_url)
+        deleted = await URLService.delete_url(db, short_code, long_url)
         
         if deleted:
+            mark_read_primary(response)
             return {"message": "URL deleted successfully"}
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found")
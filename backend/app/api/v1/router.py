@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import urls
+from app.api.v1.endpoints import admin, urls
 
 api_router = APIRouter()
-api_router.include_router(urls.router, prefix="/urls", tags=["urls"])
\ No newline at end of file
+api_router.include_router(urls.router, prefix="/urls", tags=["urls"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
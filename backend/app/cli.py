@@ -0,0 +1,55 @@
+"""Bulk import and export of short URLs
+
+    python -m app.cli import links.csv [--format csv|jsonl] [--batch-size 50000]
+    python -m app.cli export links.jsonl [--format csv|jsonl] [--batch-size 50000]
+
+Files hold long_url, short_code and expires_at (ISO 8601, empty for none); CSV files start
+with a header row. "-" reads stdin / writes stdout. The format defaults to the file
+extension, else CSV. Progress and throughput are logged to stderr after every batch.
+"""
+import argparse
+import logging
+import sys
+from contextlib import nullcontext
+from app.services.bulk_transfer import DEFAULT_BATCH_SIZE, FORMATS, export_urls, import_urls
+
+
+def _format_for(path: str, requested: str | None) -> str:
+    if requested:
+        return requested
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _open(path: str, mode: str):
+    if path == "-":
+        return nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    # newline="" lets the csv module handle line endings inside quoted fields
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help='file to read or write, "-" for stdin/stdout')
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", stream=sys.stderr)
+    fmt = _format_for(args.path, args.format)
+
+    if args.command == "import":
+        with _open(args.path, "r") as stream:
+            stats = import_urls(stream, fmt, args.batch_size)
+        logging.info(
+            f"Import finished: {stats.rows} rows, {stats.inserted} inserted, {stats.skipped} skipped, "
+            f"{stats.rejected} rejected ({stats.rate:,.0f} rows/s)"
+        )
+    else:
+        with _open(args.path, "w") as stream:
+            stats = export_urls(stream, fmt, args.batch_size)
+        logging.info(f"Export finished: {stats.rows} rows ({stats.rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
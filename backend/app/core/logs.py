@@ -0,0 +1,128 @@
+"""Logging that keeps formatting and writes off the event loop
+
+configure_logging routes every record (the app's and uvicorn's) through a QueueHandler; a
+QueueListener thread formats them, as JSON lines or text, and writes them to stderr. The
+calling thread only builds the record and enqueues it: the handler skips the usual
+`prepare` step, so messages are interpolated in the listener too. That is safe here
+because the queue never leaves the process, but mutable log arguments are rendered as they
+are when written, not when logged.
+
+Warnings and errors are rate limited per call site (LOG_ERROR_RATE per LOG_ERROR_INTERVAL);
+the next record let through reports how many were dropped in its `suppressed` field.
+"""
+import atexit
+import logging
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from app.core.config import settings
+
+# Loggers uvicorn gives their own synchronous handlers (uvicorn.error propagates to "uvicorn")
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.access")
+
+_listener: QueueListener | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; `extra={"fields": {...}}` adds top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" ({suppressed} similar suppressed)"
+        return line
+
+
+class ErrorRateLimitFilter(logging.Filter):
+    """Passes at most `rate` WARNING-or-above records per call site every `interval` seconds"""
+
+    def __init__(self, rate: int, interval: float, level: int = logging.WARNING):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.level = level
+        # (pathname, lineno) -> [window start, records passed, records dropped]
+        self.windows: dict[tuple, list] = {}
+        # Records also arrive from threadpool and background threads
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                self.windows[key] = [now, 1, 0]
+                return True
+            if window[1] < self.rate:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves all formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging():
+    """Send the root and uvicorn loggers through one background writer; safe to call again"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(ErrorRateLimitFilter(settings.LOG_ERROR_RATE, settings.LOG_ERROR_INTERVAL))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    for name in UVICORN_LOGGERS:
+        logging.getLogger(name).handlers = [handler]
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flushes what is still queued when the worker exits
+    atexit.register(_listener.stop)
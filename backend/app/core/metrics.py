@@ -0,0 +1,124 @@
+"""In-process metrics rendered in the Prometheus text exposition format
+
+Every instrument is plain Python state updated without locks, so recording costs a dict
+lookup and an add. On the event loop updates never interleave; from threadpool code (the
+sync redirect path) a rare lost increment is accepted rather than locking the hot path.
+Each worker keeps and serves its own values; Prometheus scrapes and sums the series.
+"""
+import bisect
+
+# Seconds; spans L1 hits (tens of microseconds) to slow database round trips
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination; inc is one dict update"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed observations per label combination; observe is a bisect and two list updates
+
+    Bucket counts are stored per bucket and made cumulative only when rendered.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self.series: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")
+))
+cache_lookups = registry.register(Counter(
+    "cache_lookups_total", "Short code lookups by tier (l1, l1_negative, bloom, redis, db) and result (hit, negative, miss, error); "
+    "l1_negative and bloom count codes they rejected as hits",
+    ("tier", "result")
+))
+rate_limit_rejections = registry.register(Counter(
+    "rate_limit_rejections_total", "Requests rejected with 429 by limiter", ("limiter",)
+))
+db_query_latency = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time by engine", ("engine",)
+))
+db_pool_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection by engine", ("engine",)
+))
+
+
+def render_metrics() -> str:
+    return registry.render()
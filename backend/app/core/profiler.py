@@ -0,0 +1,146 @@
+"""Statistical CPU profiler that can be switched on inside a running worker
+
+setitimer(ITIMER_PROF) raises SIGPROF every `interval` seconds of CPU time and the handler
+records the interrupted Python stack, so the profiler costs nothing while off and one stack
+walk per sample while on. Python runs signal handlers on the main thread, which is where
+uvicorn runs the event loop; anywhere else (or without setitimer) it is unavailable.
+
+Samples are not tied to a request: requests interleave on the event loop, so a profile or
+per-request breakdown includes whatever else the worker ran at the time.
+"""
+import signal
+import threading
+from collections import Counter
+from app.core.config import settings
+
+# (module prefixes, function names, phase), tried on each frame from the innermost outwards
+PHASE_RULES = (
+    (("sqlalchemy", "asyncpg", "psycopg2", "aiosqlite", "sqlite3"), (), "db"),
+    (("redis", "cachetools", "app.services.cache_service", "app.services.local_cache"), (), "cache"),
+    ((), ("get_db", "get_async_db", "get_read_db", "get_async_read_db"), "dependency"),
+    (("app.middleware.rate_limit",), (), "rate_limit"),
+    (("app.",), (), "handler"),
+    (("fastapi", "starlette.routing", "pydantic", "orjson"), (), "framework"),
+    (("starlette.middleware.gzip",), (), "gzip"),
+    (("starlette.middleware.cors",), (), "cors"),
+)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def collapse(frame) -> str:
+    """Stack as "module:function" entries joined by ";", outermost first (folded stack format)"""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def classify(frame) -> str:
+    """Request phase the innermost recognised frame belongs to, "other" if none is"""
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        for prefixes, functions, phase in PHASE_RULES:
+            matched = module.startswith(prefixes) if prefixes else frame.f_code.co_name in functions
+            if matched:
+                return phase
+        frame = frame.f_back
+    return "other"
+
+
+class Profile:
+    """Folded stacks for a profiling window, optionally only from every `every`-th request"""
+
+    def __init__(self, every: int | None = None):
+        self.every = every
+        self.stacks: Counter = Counter()
+        self.requests = 0
+        self.sampled_in_flight = 0
+
+    def record(self, frame):
+        if self.every is None or self.sampled_in_flight:
+            self.stacks[collapse(frame)] += 1
+
+    def should_sample(self) -> bool:
+        self.requests += 1
+        return self.requests % self.every == 0
+
+    def render(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class PhaseBreakdown:
+    """Samples per request phase, for one flagged request"""
+
+    def __init__(self):
+        self.phases: Counter = Counter()
+
+    def record(self, frame):
+        self.phases[classify(frame)] += 1
+
+    def render(self, interval: float) -> str:
+        if not self.phases:
+            return f"none (under {interval * 1000:g}ms CPU)"
+        return ", ".join(f"{phase}={count * interval * 1000:.1f}ms" for phase, count in self.phases.most_common())
+
+
+class ProfilerUnavailableError(Exception):
+    pass
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """Delivers each SIGPROF sample to every subscribed Profile / PhaseBreakdown"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.session: Profile | None = None
+        self._consumers = ()
+        self._installed = False
+
+    @property
+    def available(self) -> bool:
+        return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+    def _handle(self, signum, frame):
+        for consumer in self._consumers:
+            consumer.record(frame)
+
+    def subscribe(self, consumer):
+        if not self.available:
+            raise ProfilerUnavailableError("Sampling profiler needs SIGPROF on the event loop's (main) thread")
+        if not self._installed:
+            signal.signal(signal.SIGPROF, self._handle)
+            self._installed = True
+        if not self._consumers:
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        # Replaced, never mutated, so the handler always iterates a consistent tuple
+        self._consumers = self._consumers + (consumer,)
+
+    def unsubscribe(self, consumer):
+        self._consumers = tuple(c for c in self._consumers if c is not consumer)
+        if not self._consumers and self._installed:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+    def start_session(self, every: int | None = None) -> Profile:
+        if self.session is not None:
+            raise ProfilerBusyError("A profiling session is already running")
+        session = Profile(every)
+        self.subscribe(session)
+        self.session = session
+        return session
+
+    def stop_session(self):
+        if self.session is not None:
+            self.unsubscribe(self.session)
+            self.session = None
+
+
+profiler = SamplingProfiler(settings.PROFILER_INTERVAL)
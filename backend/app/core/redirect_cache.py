@@ -0,0 +1,87 @@
+"""Cache headers for redirects, so a CDN or reverse proxy in front can answer most of them
+
+Every redirect carries Cache-Control (max-age for browsers, s-maxage for shared caches, or
+`private` when shared caches get no lifetime) and Expires, both capped at the link's remaining lifetime, and its surrogate keys in the two
+conventions CDNs read: Surrogate-Key (Fastly, Varnish xkey) and Cache-Tag (Cloudflare,
+Akamai). Deleting a link purges its key through app.services.edge_purger; expiring links
+need no purge, since nothing may cache them past expires_at.
+"""
+import logging
+import time
+from email.utils import formatdate
+from fastapi.responses import RedirectResponse
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_STATUS_CODES = (301, 302, 307, 308)
+
+# Default s-maxage when a purger can evict deleted links from the edge
+PURGED_EDGE_MAX_AGE = 24 * 60 * 60
+
+if settings.REDIRECT_STATUS_CODE not in REDIRECT_STATUS_CODES:
+    raise ValueError(f"Unsupported redirect status code: {settings.REDIRECT_STATUS_CODE}")
+
+# Without a purger nothing would evict a deleted link from a shared cache, so by default redirects
+# are private: browsers may keep them for REDIRECT_MAX_AGE, shared caches may not store them
+if settings.REDIRECT_EDGE_MAX_AGE is None:
+    EDGE_MAX_AGE = PURGED_EDGE_MAX_AGE if settings.EDGE_PURGER != "none" else 0
+else:
+    EDGE_MAX_AGE = settings.REDIRECT_EDGE_MAX_AGE
+    if EDGE_MAX_AGE > 0 and settings.EDGE_PURGER == "none":
+        logger.warning(f"REDIRECT_EDGE_MAX_AGE={EDGE_MAX_AGE} without an EDGE_PURGER: deleted links stay cached at the edge that long")
+
+# Tags every redirect, so all of them can be purged at once (e.g. after changing the policy)
+ALL_REDIRECTS_KEY = "redirects"
+
+
+# Last Expires value formatted, as [unix second, header]: formatdate costs more than the rest of a hit
+_last_expires = [0, b""]
+
+
+def surrogate_key(short_code: str) -> str:
+    return f"url-{short_code}"
+
+
+def _cache_control(max_age: int, edge_max_age: int) -> bytes:
+    if max_age <= 0 and edge_max_age <= 0:
+        return b"no-store"
+    # s-maxage=0 would still let a shared cache store the redirect and revalidate it
+    if edge_max_age <= 0:
+        return f"private, max-age={max_age}".encode("latin-1")
+    return f"public, max-age={max_age}, s-maxage={edge_max_age}".encode("latin-1")
+
+
+# Header for links that outlive both ages, i.e. nearly all of them
+_DEFAULT_CACHE_CONTROL = _cache_control(settings.REDIRECT_MAX_AGE, EDGE_MAX_AGE)
+
+
+def _expires(max_age: int) -> bytes:
+    at = int(time.time()) + max_age
+    if at != _last_expires[0]:
+        _last_expires[:] = [at, formatdate(at, usegmt=True).encode("latin-1")]
+    return _last_expires[1]
+
+
+def redirect_headers(short_code: str, remaining: float | None) -> list[tuple[bytes, bytes]]:
+    """Raw caching headers for a redirect whose link has `remaining` seconds left (None: no expiry)"""
+    max_age, edge_max_age = settings.REDIRECT_MAX_AGE, EDGE_MAX_AGE
+    cache_control = _DEFAULT_CACHE_CONTROL
+    if remaining is not None and remaining < max(max_age, edge_max_age):
+        remaining = max(0, int(remaining))
+        max_age, edge_max_age = min(max_age, remaining), min(edge_max_age, remaining)
+        cache_control = _cache_control(max_age, edge_max_age)
+
+    key = surrogate_key(short_code)
+    return [
+        (b"cache-control", cache_control),
+        (b"expires", _expires(max_age)),
+        (b"surrogate-key", f"{ALL_REDIRECTS_KEY} {key}".encode("latin-1")),
+        (b"cache-tag", f"{ALL_REDIRECTS_KEY},{key}".encode("latin-1")),
+    ]
+
+
+def redirect_response(long_url: str, short_code: str, remaining: float | None) -> RedirectResponse:
+    response = RedirectResponse(url=long_url, status_code=settings.REDIRECT_STATUS_CODE)
+    response.raw_headers.extend(redirect_headers(short_code, remaining))
+    return response
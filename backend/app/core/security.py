@@ -0,0 +1,9 @@
+import hmac
+from app.core.config import settings
+
+
+def is_admin_token(token: str | None) -> bool:
+    """Whether `token` matches ADMIN_TOKEN; always False while no admin token is configured"""
+    if not settings.ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8"))
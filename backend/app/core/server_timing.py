@@ -0,0 +1,67 @@
+"""Per-request phase timings reported in a Server-Timing response header (SERVER_TIMING_ENABLED)
+
+ServerTimingMiddleware puts a ServerTimings in a ContextVar for each request; instrumented
+code wraps its phases in `phase(name)`. When the setting is off the middleware is not
+installed, so `phase` finds no timings and hands back a shared no-op context manager.
+"""
+import time
+from contextvars import ContextVar
+from fastapi.responses import ORJSONResponse
+
+
+class ServerTimings:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+current_timings: ContextVar[ServerTimings | None] = ContextVar("server_timings", default=None)
+
+
+class _Phase:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: ServerTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name: str):
+    """Context manager adding its duration to the current request's `name` phase"""
+    timings = current_timings.get()
+    return _NO_PHASE if timings is None else _Phase(timings, name)
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that times rendering as the "serialize" phase"""
+
+    def render(self, content) -> bytes:
+        with phase("serialize"):
+            return super().render(content)
+
@@ -1,24 +1,130 @@
 import logging
-from sqlalchemy import create_engine
+import time
+from fastapi import HTTPException
+from sqlalchemy import Connection, create_engine, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import db_pool_wait, db_query_latency
 
 logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL, pool_size=10, max_overflow=5)
+# Sync drivers mapped to their asyncio counterparts
+ASYNC_DRIVERS = {
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "postgresql://": "postgresql+asyncpg://",
+    "sqlite://": "sqlite+aiosqlite://",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Same database through its asyncio driver"""
+    for sync_prefix, async_prefix in ASYNC_DRIVERS.items():
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    
+    return url
+
+
+def get_async_database_url() -> str:
+    """Resolve the async database URL, deriving it from DATABASE_URL if not set"""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    
+    return to_async_url(settings.DATABASE_URL)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    metrics_engine = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start, self.metrics_engine)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    metrics_engine = "async"
+
+
+def get_pool_options(url: str, is_async: bool = False) -> dict:
+    """Pool sizing for server databases; SQLite (local runs) keeps its default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {"pool_size": 10, "max_overflow": 5, "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool}
+
+
+def instrument_query_timings(sync_engine, label: str):
+    """Record every statement's execution time in db_query_duration_seconds"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        db_query_latency.observe(time.perf_counter() - conn.info["query_start_time"].pop(), label)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _discard(context):
+        # A failed statement never reaches after_cursor_execute: drop its start time
+        starts = context.connection.info.get("query_start_time") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+engine = create_engine(settings.DATABASE_URL, **get_pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_query_timings(engine, "sync")
+
+async_engine = create_async_engine(get_async_database_url(), **get_pool_options(get_async_database_url(), is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+instrument_query_timings(async_engine.sync_engine, "async")
+
 Base = declarative_base()
 
+
+def dialect_insert(db, table):
+    """Dialect-specific INSERT with ON CONFLICT support (SQLite is used for local runs); db is a session or connection"""
+    dialect = db.dialect if isinstance(db, Connection) else db.bind.dialect
+    if dialect.name == "sqlite":
+        return sqlite_insert(table)
+    return pg_insert(table)
+
+
+def log_session_error(e: Exception):
+    # HTTPExceptions (404s and the like) pass through session dependencies but are not database errors
+    if not isinstance(e, HTTPException):
+        logger.error("Database session error: %s", e)
+
+
 def get_db():
-    logger.info("Creating database session")
     db = SessionLocal()
     try:
         yield db
     except Exception as e:
-        logger.error(f"Database session error: {e}")
+        log_session_error(e)
         db.rollback()
         raise
     finally:
-        logger.info("Closing database session")
         db.close()
+
+
+async def get_async_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        log_session_error(e)
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
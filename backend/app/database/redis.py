@@ -1,8 +1,15 @@
 import redis
+import redis.asyncio as aioredis
 from app.core.config import settings
 
 # Create Redis connection
 redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
+# Async Redis connection for the event loop (redirects, v1 endpoints)
+async_redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
 def get_redis():
-    return redis_client
\ No newline at end of file
+    return redis_client
+
+def get_async_redis():
+    return async_redis_client
@@ -0,0 +1,145 @@
+"""Read replicas for redirect lookups and URL listing (REPLICA_DATABASE_URLS)
+
+Reads are spread round-robin over the replicas. A replica whose connection fails is skipped
+for REPLICA_RETRY_AFTER seconds, and reads fall back to the primary while none is healthy.
+
+Replicas lag the primary, so reads that must see a recent write stay on the primary for
+READ_YOUR_WRITES_WINDOW seconds: lookups of a short code created or deleted in that window
+(every worker hears of it through L1Invalidator), and any read from a client holding the
+cookie its own write set. Keep the window above the replicas' usual lag.
+"""
+import logging
+import math
+import time
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.database.database import SessionLocal, AsyncSessionLocal, get_pool_options, instrument_query_timings, log_session_error, to_async_url
+
+logger = logging.getLogger(__name__)
+
+# Set on the client by writes; its reads go to the primary until it expires
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+class Replica:
+    """Sync and async engines for one read replica, with its health"""
+
+    def __init__(self, url: str, name: str, retry_after: float, timer=time.monotonic):
+        self.name = name
+        self.retry_after = retry_after
+        self.timer = timer
+        self.down_until = 0.0
+
+        self.engine = create_engine(url, **get_pool_options(url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        async_url = to_async_url(url)
+        self.async_engine = create_async_engine(async_url, **get_pool_options(async_url, is_async=True))
+        self.AsyncSessionLocal = async_sessionmaker(self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+        for sync_engine in (self.engine, self.async_engine.sync_engine):
+            instrument_query_timings(sync_engine, name)
+            event.listen(sync_engine, "handle_error", self._on_error)
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= self.timer()
+
+    def _on_error(self, context):
+        # Lost or refused connections take the replica out of rotation; statement errors do not
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            if self.healthy:
+                logger.warning(f"Read replica {self.name} failed, skipping it for {self.retry_after}s: {context.original_exception}")
+            self.down_until = self.timer() + self.retry_after
+
+    async def dispose(self):
+        self.engine.dispose()
+        await self.async_engine.dispose()
+
+
+class ReplicaRouter:
+    """Chooses where each read runs: a healthy replica in turn, or the primary"""
+
+    def __init__(self, urls: list[str], retry_after: float):
+        self.replicas = [Replica(url, f"replica{index}", retry_after) for index, url in enumerate(urls)]
+        self._next = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self, short_code: str | None = None, sticky: bool = False) -> Replica | None:
+        """Replica to serve a read, None when it belongs on the primary"""
+        if not self.replicas or sticky:
+            return None
+        if short_code is not None:
+            from app.services.local_cache import recent_writes
+            if short_code in recent_writes:
+                return None
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if replica.healthy:
+                return replica
+        return None
+
+    def async_sessionmaker_for(self, short_code: str | None = None, sticky: bool = False):
+        replica = self.pick(short_code, sticky)
+        return replica.AsyncSessionLocal if replica is not None else AsyncSessionLocal
+
+    def sessionmaker_for(self, short_code: str | None = None, sticky: bool = False):
+        replica = self.pick(short_code, sticky)
+        return replica.SessionLocal if replica is not None else SessionLocal
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.dispose()
+
+
+replica_router = ReplicaRouter(
+    [url.strip() for url in settings.REPLICA_DATABASE_URLS.split(",") if url.strip()],
+    settings.REPLICA_RETRY_AFTER
+)
+
+
+def _route(request: Request) -> tuple[str | None, bool]:
+    return request.path_params.get("short_code"), READ_PRIMARY_COOKIE in request.cookies
+
+
+def mark_read_primary(response: Response):
+    """Keep this client's reads on the primary until its write has reached the replicas"""
+    if replica_router.enabled:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, "1",
+            max_age=math.ceil(settings.READ_YOUR_WRITES_WINDOW),
+            httponly=True,
+            samesite="lax"
+        )
+
+
+def get_read_db(request: Request):
+    db = replica_router.sessionmaker_for(*_route(request))()
+    try:
+        yield db
+    except Exception as e:
+        log_session_error(e)
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    db = replica_router.async_sessionmaker_for(*_route(request))()
+    try:
+        yield db
+    except Exception as e:
+        log_session_error(e)
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
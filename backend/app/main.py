@@ -1,40 +1,74 @@
-import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import RedirectResponse, ORJSONResponse
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.v1.router import api_router
 from app.core.config import settings
 from app.core.health import startup_health_check, get_database_health
-from app.services.url_service import URLService
-from app.database.database import get_db
+from app.core.logs import configure_logging
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, cache_lookups, render_metrics
+from app.core.redirect_cache import redirect_response
+from app.core.server_timing import TimedORJSONResponse, phase
+from app.services.url_service import URLService, REDIS_MISSED
+from app.database.database import async_engine
+from app.database.replicas import get_read_db, get_async_read_db, replica_router
+from app.database.redis import get_async_redis
 from app.middleware.rate_limit import rate_limit_middleware
-from cachetools import TTLCache
+from app.middleware.access_log import AccessLogMiddleware, parse_sample_rates
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiler import ProfilerMiddleware
+from app.middleware.redirect_fast_path import RedirectFastPath
+from app.middleware.server_timing import ServerTimingMiddleware
+from app.services.local_cache import get_cached_link, cache_url_locally, l1_invalidator
+from app.services.click_tracker import click_tracker
+from app.services.create_batcher import create_batcher
+from app.services.expiry_sweeper import expiry_sweeper
+from app.services.hot_keys import hot_keys
+from app.utils.expiry import seconds_until
+from app.utils.url_generator import is_valid_short_code
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-
-# In-memory cache for hot URLs
-url_cache = TTLCache(maxsize=10000, ttl=300)  # 5 min TTL
+configure_logging()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     startup_health_check()
+    l1_invalidator.start()
+    if settings.HOT_KEYS_ENABLED:
+        # Warm before the first request, else a fresh worker sends all its traffic to Redis and Postgres.
+        # Subscribing clears L1, so wait for that first.
+        if await l1_invalidator.wait_subscribed(timeout=5):
+            await hot_keys.warm()
+        hot_keys.start()
+    if settings.CLICK_TRACKING_ENABLED:
+        click_tracker.start()
+    if settings.EXPIRY_SWEEP_ENABLED:
+        expiry_sweeper.start()
+    if settings.CREATE_BATCH_ENABLED:
+        create_batcher.start()
     yield
-    pass
+    # Shutdown
+    if settings.CREATE_BATCH_ENABLED:
+        await create_batcher.stop()
+    await l1_invalidator.stop()
+    await expiry_sweeper.stop()
+    if settings.HOT_KEYS_ENABLED:
+        await hot_keys.stop()
+    if settings.CLICK_TRACKING_ENABLED:
+        await click_tracker.stop()
+    await async_engine.dispose()
+    await replica_router.dispose()
+    await get_async_redis().aclose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="URL Shortener API",
     lifespan=lifespan,
-    default_response_class=ORJSONResponse,
+    default_response_class=TimedORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None
 )
@@ -48,6 +82,16 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 app.middleware("http")(rate_limit_middleware)
+if settings.REDIRECT_FAST_PATH:
+    # Inside metrics, profiling and Server-Timing; ahead of rate limiting, CORS, GZip and routing
+    app.add_middleware(RedirectFastPath, router=app.router)
+app.add_middleware(ProfilerMiddleware)
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+if settings.ACCESS_LOG_ENABLED:
+    app.add_middleware(AccessLogMiddleware, sample_rates=parse_sample_rates(settings.ACCESS_LOG_SAMPLE_RATES))
+# Outermost, so latencies include every other middleware
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 
@@ -68,19 +112,79 @@ async def db_health_check():
     return get_database_health()
 
 
-@app.get("/{short_code}")
-def redirect_url(short_code: str, db: Session = Depends(get_db)):
-    """Redirect to the original URL given a short code"""
-    
-    # Check in-memory cache first
-    if short_code in url_cache:
-        return RedirectResponse(url=url_cache[short_code], status_code=status.HTTP_301_MOVED_PERMANENTLY)
-    
-    url = URLService.get_url_by_short_code(short_code=short_code, db=db)
-    if not url:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Short URL not found")
-    
-    # Cache the result
-    url_cache[short_code] = url.long_url
-    
-    return RedirectResponse(url=url.long_url, status_code=status.HTTP_301_MOVED_PERMANENTLY)
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+if settings.USE_ASYNC_REDIRECT:
+    @app.get("/{short_code}")
+    async def redirect_url(short_code: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+        """Redirect to the original URL given a short code"""
+        
+        # Reject paths that can never be a short code (favicon.ico, robots.txt, probes) before any lookup
+        if not is_valid_short_code(short_code):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Short URL not found")
+        
+        # Check in-memory cache first
+        with phase("l1"):
+            cached = get_cached_link(short_code)
+        if cached is not None:
+            cache_lookups.inc("l1", "hit")
+            if settings.CLICK_TRACKING_ENABLED:
+                click_tracker.record(short_code)
+            if settings.HOT_KEYS_ENABLED:
+                hot_keys.record(short_code)
+            return redirect_response(cached[0], short_code, cached[1])
+        
+        cache_lookups.inc("l1", "miss")
+        url = await URLService.get_url_by_short_code_async(
+            short_code=short_code, db=db, redis_missed=getattr(request.state, REDIS_MISSED, False)
+        )
+        if not url:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Short URL not found")
+        
+        # Cache the result
+        cache_url_locally(short_code, url.long_url, url.expires_at)
+        
+        if settings.CLICK_TRACKING_ENABLED:
+            click_tracker.record(short_code)
+        if settings.HOT_KEYS_ENABLED:
+            hot_keys.record(short_code)
+        
+        return redirect_response(url.long_url, short_code, seconds_until(url.expires_at))
+else:
+    @app.get("/{short_code}")
+    def redirect_url(short_code: str, db: Session = Depends(get_read_db)):
+        """Redirect to the original URL given a short code (sync, runs in the threadpool)"""
+        
+        # Reject paths that can never be a short code (favicon.ico, robots.txt, probes) before any lookup
+        if not is_valid_short_code(short_code):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Short URL not found")
+        
+        # Check in-memory cache first
+        with phase("l1"):
+            cached = get_cached_link(short_code)
+        if cached is not None:
+            cache_lookups.inc("l1", "hit")
+            if settings.CLICK_TRACKING_ENABLED:
+                click_tracker.record(short_code)
+            if settings.HOT_KEYS_ENABLED:
+                hot_keys.record(short_code)
+            return redirect_response(cached[0], short_code, cached[1])
+        
+        cache_lookups.inc("l1", "miss")
+        url = URLService.get_url_by_short_code(short_code=short_code, db=db)
+        if not url:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Short URL not found")
+        
+        # Cache the result
+        cache_url_locally(short_code, url.long_url, url.expires_at)
+        
+        if settings.CLICK_TRACKING_ENABLED:
+            click_tracker.record(short_code)
+        if settings.HOT_KEYS_ENABLED:
+            hot_keys.record(short_code)
+        
+        return redirect_response(url.long_url, short_code, seconds_until(url.expires_at))
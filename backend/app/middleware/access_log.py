@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+
+access_logger = logging.getLogger("app.access")
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """ACCESS_LOG_SAMPLE_RATES ("/{short_code}=0.01,/health=0") as route template -> fraction"""
+    rates = {}
+    for item in spec.split(","):
+        if item.strip():
+            route, _, rate = item.partition("=")
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware writing one structured access record per sampled request
+
+    Requests are sampled per route template (ACCESS_LOG_SAMPLE_RATES, 1.0 for unlisted
+    routes); requests that matched no route, such as 429s sent before routing during a
+    flood, are sampled as "unmatched". 5xx responses are always logged, at ERROR so they are rate limited like other
+    errors. While app.access is below INFO the middleware only checks the level.
+    """
+
+    def __init__(self, app, sample_rates: dict[str, float]):
+        self.app = app
+        self.sample_rates = sample_rates
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not access_logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            if status_code >= 500 or random.random() < self.sample_rates.get(route_path, 1.0):
+                client = scope.get("client")
+                access_logger.log(
+                    logging.ERROR if status_code >= 500 else logging.INFO,
+                    "access",
+                    extra={"fields": {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": route_path,
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                        "client": client[0] if client else None,
+                    }}
+                )
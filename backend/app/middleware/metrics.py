@@ -0,0 +1,42 @@
+import time
+from app.core.metrics import request_latency
+
+# Methods labelled as themselves; anything else a client sends is "OTHER"
+KNOWN_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request into http_request_duration_seconds
+
+    Requests are labelled by route template (e.g. "/{short_code}"), never the raw path, so
+    series stay bounded; requests that matched no route (404s, 429s) share "unmatched", and
+    methods outside KNOWN_METHODS share "OTHER".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            request_latency.observe(
+                time.perf_counter() - start,
+                scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER",
+                route.path if route is not None else "unmatched",
+                status_code
+            )
@@ -0,0 +1,63 @@
+from app.core.config import settings
+from app.core.profiler import PhaseBreakdown, ProfilerUnavailableError, profiler
+from app.core.security import is_admin_token
+
+
+class ProfilerMiddleware:
+    """Pure ASGI middleware feeding the sampling profiler
+
+    While a 1-in-K profiling session runs, marks every K-th request as sampled. A request
+    carrying `X-Profile: 1` and a valid `X-Admin-Token` is sampled on its own and answered
+    with an `X-Profile-Phases` header estimating CPU time per phase (middleware, dependency,
+    cache, DB, handler). Without an admin token configured and no session, requests pass
+    straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if scope["type"] != "http" or (settings.ADMIN_TOKEN is None and session is None):
+            await self.app(scope, receive, send)
+            return
+
+        sampled = session is not None and session.every is not None and session.should_sample()
+        if sampled:
+            session.sampled_in_flight += 1
+        try:
+            if settings.ADMIN_TOKEN is not None and self._is_flagged(scope):
+                await self._profile_request(scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            if sampled:
+                session.sampled_in_flight -= 1
+
+    @staticmethod
+    def _is_flagged(scope) -> bool:
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1":
+            return False
+        token = headers.get(b"x-admin-token")
+        return is_admin_token(token.decode("latin-1") if token else None)
+
+    async def _profile_request(self, scope, receive, send):
+        breakdown = PhaseBreakdown()
+        try:
+            profiler.subscribe(breakdown)
+        except ProfilerUnavailableError:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_phases(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-phases", breakdown.render(profiler.interval).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_phases)
+        finally:
+            profiler.unsubscribe(breakdown)
@@ -1,54 +1,197 @@
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 import time
+import logging
 from collections import defaultdict, deque
 from typing import Dict, Deque
 import asyncio
+from app.database.redis import get_async_redis
+from app.core.config import settings
+from app.core.metrics import rate_limit_rejections
+from app.core.server_timing import phase
+
+logger = logging.getLogger(__name__)
+
+# request.state flag set by RedirectFastPath once it has applied the redirect limit
+REDIRECT_CHECKED = "redirect_rate_checked"
+
 
 class RateLimiter:
+    """Sliding-window log limiter: one timestamp per request (or unit of cost), per worker ("memory" backend)"""
+
     def __init__(self, max_requests: int = 100, window_seconds: int = 60):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self.requests: Dict[str, Deque[float]] = defaultdict(deque)
         self._lock = asyncio.Lock()
-    
-    async def is_allowed(self, identifier: str) -> bool:
+
+    async def is_allowed(self, identifier: str, cost: int = 1) -> bool:
         async with self._lock:
             now = time.time()
             window_start = now - self.window_seconds
-            
+
             # Clean old requests
             while self.requests[identifier] and self.requests[identifier][0] < window_start:
                 self.requests[identifier].popleft()
-            
+
             # Check if under limit
-            if len(self.requests[identifier]) < self.max_requests:
-                self.requests[identifier].append(now)
+            if len(self.requests[identifier]) + cost <= self.max_requests:
+                self.requests[identifier].extend([now] * cost)
                 return True
-            
+
             return False
 
+
+class LocalGCRARateLimiter:
+    """GCRA limiter with one float per key and at most max_keys keys, per worker ("local" backend)
+
+    Allows bursts of up to max_requests and a sustained max_requests per window; a request of
+    `cost` spends that many units of the budget at once. A key whose
+    theoretical arrival time has passed carries no state, so when the table fills those are
+    dropped first, then the oldest tenth. No lock is needed: is_allowed never awaits.
+    """
+
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60, max_keys: int = 100_000):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self.emission_interval = window_seconds / max_requests
+        self.tats: Dict[str, float] = {}
+
+    def _make_room(self, now: float):
+        self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+        if len(self.tats) >= self.max_keys:
+            for key in list(self.tats)[:max(1, self.max_keys // 10)]:
+                del self.tats[key]
+
+    def check(self, identifier: str, cost: int = 1) -> bool:
+        now = time.monotonic()
+        # Theoretical arrival time: when the key's budget would be fully spent
+        tat = self.tats.get(identifier, now)
+        if tat < now:
+            tat = now
+        new_tat = tat + self.emission_interval * cost
+        if new_tat - now > self.window_seconds:
+            return False
+        if len(self.tats) >= self.max_keys and identifier not in self.tats:
+            self._make_room(now)
+        self.tats[identifier] = new_tat
+        return True
+
+    async def is_allowed(self, identifier: str, cost: int = 1) -> bool:
+        return self.check(identifier, cost)
+
+
+# Atomic GCRA on Redis server time; state is a single key per identifier expiring with the window
+GCRA_SCRIPT = """
+local emission_us = tonumber(ARGV[1])
+local window_us = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission_us
+if new_tat - now > window_us then
+    return 0
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000))
+return 1
+"""
+
+
+class RedisRateLimiter:
+    """GCRA limiter shared by all workers through one Redis key per identifier ("redis" backend)
+
+    While Redis is unreachable, decisions fall back to a LocalGCRARateLimiter and Redis is
+    not retried for `retry_after` seconds, so an outage costs no extra latency per request.
+    """
+
+    def __init__(self, name: str, max_requests: int = 100, window_seconds: int = 60, retry_after: float = 5.0):
+        self.name = name
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.retry_after = retry_after
+        self.fallback = LocalGCRARateLimiter(max_requests, window_seconds)
+        self._emission_us = int(window_seconds * 1_000_000 / max_requests)
+        self._window_us = int(window_seconds * 1_000_000)
+        self._script = None
+        self._redis_down_until = 0.0
+        # Decisions made by the fallback instead of Redis
+        self.fallback_decisions = 0
+
+    async def is_allowed(self, identifier: str, cost: int = 1) -> bool:
+        if time.monotonic() < self._redis_down_until:
+            self.fallback_decisions += 1
+            return self.fallback.check(identifier, cost)
+
+        try:
+            if self._script is None:
+                self._script = get_async_redis().register_script(GCRA_SCRIPT)
+            allowed = await self._script(
+                keys=[f"ratelimit:{self.name}:{identifier}"],
+                args=[self._emission_us * cost, self._window_us]
+            )
+            return allowed == 1
+        except Exception as e:
+            logger.warning(f"Rate limiter '{self.name}' using local fallback, Redis unavailable: {e}")
+            self._redis_down_until = time.monotonic() + self.retry_after
+            self.fallback_decisions += 1
+            return self.fallback.check(identifier, cost)
+
+
+def build_limiter(backend: str, name: str, max_requests: int, window_seconds: int):
+    """Build a limiter for a CREATE_RATE_LIMITER / REDIRECT_RATE_LIMITER backend: "redis", "local" or "memory" """
+    if backend == "redis":
+        return RedisRateLimiter(name, max_requests, window_seconds)
+    if backend == "local":
+        return LocalGCRARateLimiter(max_requests, window_seconds)
+    if backend == "memory":
+        return RateLimiter(max_requests, window_seconds)
+    raise ValueError(f"Unknown rate limiter backend: {backend}")
+
+
 # Global rate limiter instances
-create_limiter = RateLimiter(max_requests=10, window_seconds=60)  # 10 creates per minute
-redirect_limiter = RateLimiter(max_requests=1000, window_seconds=60)  # 1000 redirects per minute
+create_limiter = build_limiter(settings.CREATE_RATE_LIMITER, "create", max_requests=10, window_seconds=60)  # 10 creates per minute
+redirect_limiter = build_limiter(settings.REDIRECT_RATE_LIMITER, "redirect", max_requests=1000, window_seconds=60)  # 1000 redirects per minute
+# Charged per item by the bulk endpoint, which alone knows the count
+bulk_create_limiter = build_limiter(settings.CREATE_RATE_LIMITER, "bulk_create", max_requests=50000, window_seconds=60)  # 50000 bulk-created links per minute
+
+
+async def allow_bulk_create(request: Request, items: int) -> bool:
+    """Charge a bulk create of `items` links against bulk_create_limiter"""
+    client_ip = request.client.host if request.client else "unknown"
+    with phase("ratelimit"):
+        allowed = await bulk_create_limiter.is_allowed(client_ip, cost=items)
+    if not allowed:
+        rate_limit_rejections.inc("bulk_create")
+    return allowed
+
 
 async def rate_limit_middleware(request: Request, call_next):
     client_ip = request.client.host if request.client else "unknown"
-    
+
     # Apply different limits based on endpoint
     if request.url.path.startswith("/api/v1/urls/create"):
-        if not await create_limiter.is_allowed(client_ip):
+        with phase("ratelimit"):
+            allowed = await create_limiter.is_allowed(client_ip)
+        if not allowed:
+            rate_limit_rejections.inc("create")
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={"detail": "Rate limit exceeded for URL creation"}
             )
-    elif len(request.url.path.split("/")) == 2 and request.url.path != "/":
+    elif len(request.url.path.split("/")) == 2 and request.url.path != "/" and not getattr(request.state, REDIRECT_CHECKED, False):
         # This is likely a redirect request
-        if not await redirect_limiter.is_allowed(client_ip):
+        with phase("ratelimit"):
+            allowed = await redirect_limiter.is_allowed(client_ip)
+        if not allowed:
+            rate_limit_rejections.inc("redirect")
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={"detail": "Rate limit exceeded for redirects"}
             )
-    
+
     response = await call_next(request)
-    return response
\ No newline at end of file
+    return response
@@ -0,0 +1,107 @@
+from urllib.parse import quote
+from app.core.config import settings
+from app.core.metrics import cache_lookups, rate_limit_rejections
+from app.core.redirect_cache import redirect_headers
+from app.core.server_timing import phase
+from app.middleware import rate_limit
+from app.services.click_tracker import click_tracker
+from app.services.hot_keys import hot_keys
+from app.services.local_cache import cache_url_locally, get_cached_link
+from app.services.cache_service import CacheService
+from app.services.url_service import URLService, REDIS_MISSED
+from app.utils.expiry import seconds_until
+from app.utils.url_generator import is_valid_short_code
+
+# Characters RedirectResponse leaves unquoted in Location, so both paths send the same header
+_LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+_REDIRECT_BODY = {"type": "http.response.body", "body": b""}
+_RATE_LIMITED_BODY = {"type": "http.response.body", "body": b'{"detail":"Rate limit exceeded for redirects"}'}
+_RATE_LIMITED_START = {
+    "type": "http.response.start",
+    "status": 429,
+    "headers": [(b"content-length", str(len(_RATE_LIMITED_BODY["body"])).encode()), (b"content-type", b"application/json")],
+}
+
+
+class _RedirectRoute:
+    # Stands in for the routed endpoint in scope["route"], so metrics label fast-path hits the same way
+    path = "/{short_code}"
+
+
+class RedirectFastPath:
+    """Pure ASGI layer answering cached redirects before CORS, GZip, routing and dependencies run
+
+    A GET for a single-segment path that is a valid short code (and no other route) is rate
+    limited with the redirect limiter, then answered with a bare redirect from L1 or Redis. Every
+    other request, and every short code neither tier holds, goes to the full app, which skips
+    the redirect limit already applied here. Requests carrying an Origin header go through
+    too, so they still get CORS headers.
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        # Paths like /health and /metrics belong to their routes even though they look like short codes
+        self.reserved = {
+            route.path[1:] for route in router.routes
+            if getattr(route, "path", "").count("/") == 1 and "{" not in route.path
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        short_code = scope["path"][1:]
+        if not is_valid_short_code(short_code) or short_code in self.reserved:
+            await self.app(scope, receive, send)
+            return
+        for name, _ in scope["headers"]:
+            if name == b"origin":
+                await self.app(scope, receive, send)
+                return
+
+        client = scope.get("client")
+        with phase("ratelimit"):
+            allowed = await rate_limit.redirect_limiter.is_allowed(client[0] if client else "unknown")
+        if not allowed:
+            rate_limit_rejections.inc("redirect")
+            await send(_RATE_LIMITED_START)
+            await send(_RATE_LIMITED_BODY)
+            return
+        scope.setdefault("state", {})[rate_limit.REDIRECT_CHECKED] = True
+
+        with phase("l1"):
+            cached = get_cached_link(short_code)
+        if cached is not None:
+            cache_lookups.inc("l1", "hit")
+            long_url, remaining = cached
+        else:
+            url = await URLService.get_cached_url_async(short_code)
+            if url is None or url is CacheService.MISS:
+                # Not cached: the full app counts the L1 miss and goes on to the database, without
+                # asking Redis again when it answered (it is asked again after a Redis error)
+                if url is CacheService.MISS:
+                    scope["state"][REDIS_MISSED] = True
+                await self.app(scope, receive, send)
+                return
+            cache_lookups.inc("l1", "miss")
+            cache_url_locally(short_code, url.long_url, url.expires_at)
+            long_url, remaining = url.long_url, seconds_until(url.expires_at)
+
+        if settings.CLICK_TRACKING_ENABLED:
+            click_tracker.record(short_code)
+        if settings.HOT_KEYS_ENABLED:
+            hot_keys.record(short_code)
+
+        scope["route"] = _RedirectRoute
+        await send({
+            "type": "http.response.start",
+            "status": settings.REDIRECT_STATUS_CODE,
+            "headers": [
+                (b"content-length", b"0"),
+                (b"location", quote(long_url, safe=_LOCATION_SAFE).encode("latin-1")),
+                *redirect_headers(short_code, remaining),
+            ],
+        })
+        await send(_REDIRECT_BODY)
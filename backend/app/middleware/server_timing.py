@@ -0,0 +1,30 @@
+import time
+from app.core.server_timing import ServerTimings, current_timings
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware adding a Server-Timing header with the request's phases"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = ServerTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(time.perf_counter() - start).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
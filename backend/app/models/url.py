@@ -1,18 +1,33 @@
 from app.database.database import Base
-from sqlalchemy import Column, UUID, String, DateTime
+from sqlalchemy import Column, UUID, String, DateTime, Sequence, Index, LargeBinary
 from sqlalchemy.sql import func
 from uuid import uuid4
+from app.utils.url_digest import long_url_digest
+
+
+# Short code IDs are leased in blocks: each nextval() reserves `increment` IDs for one worker
+url_code_seq = Sequence("url_code_seq", start=1, increment=1000, metadata=Base.metadata)
+
+
+def _default_long_url_hash(context):
+    return long_url_digest(context.get_current_parameters()["long_url"])
 
 
 class URL(Base):
     __tablename__ = "urls"
     
     id = Column(UUID, primary_key=True, index=True, default=uuid4)
-    long_url = Column(String, nullable=False, unique=True, index=True)
+    long_url = Column(String, nullable=False)
+    long_url_hash = Column(LargeBinary, nullable=False, unique=True, index=True, default=_default_long_url_hash)
     short_code = Column(String, unique=True, index=True, nullable=False)
-    expires_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index=True)
     created_at = Column(DateTime, server_default=func.now())
     
+    __table_args__ = (
+        # Keyset pagination for the list endpoint: ORDER BY created_at DESC, id DESC
+        Index("ix_urls_created_at_id", "created_at", "id"),
+    )
+    
     def is_active(self):
         if self.expires_at:
             return func.now() < self.expires_at
@@ -0,0 +1,14 @@
+from app.database.database import Base
+from sqlalchemy import Column, String, BigInteger, DateTime
+
+
+class URLClick(Base):
+    """Aggregated redirect counts per short code, written in batches by ClickTracker"""
+    __tablename__ = "url_clicks"
+    
+    short_code = Column(String, primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+    last_accessed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<URLClick(short_code={self.short_code}, clicks={self.clicks})>"
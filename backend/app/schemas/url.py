@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import List
+from app.utils.url_generator import is_valid_short_code, MAX_SHORT_CODE_LENGTH
 
 
 class URLCreate(BaseModel):
@@ -7,6 +8,14 @@ class URLCreate(BaseModel):
     custom_alias: str | None = None
     expires_in_days: int = 30
     
+    @field_validator("custom_alias")
+    @classmethod
+    def validate_custom_alias(cls, value: str | None):
+        # Aliases must be reachable: redirects reject anything outside the base62 charset
+        if value and not is_valid_short_code(value):
+            raise ValueError(f"Custom alias must be 1-{MAX_SHORT_CODE_LENGTH} characters from a-z, A-Z, 0-9")
+        return value
+    
 
 class URLResponse(BaseModel):
     short_url: str
@@ -20,3 +29,28 @@ class URLListResponse(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: str | None = None  # pass back as `cursor` for the next page
+
+
+class URLBulkCreate(BaseModel):
+    urls: List[URLCreate] = Field(..., min_length=1, max_length=50000)
+
+
+class URLBulkItemResult(BaseModel):
+    index: int
+    status: str  # created | existing | url_exists | alias_conflict | duplicate | no_free_code
+    original_url: str
+    short_url: str | None = None
+    expires_at: str | None = None
+
+
+class URLBulkResponse(BaseModel):
+    results: List[URLBulkItemResult]
+    created: int
+    failed: int
+
+
+class URLStatsResponse(BaseModel):
+    short_code: str
+    clicks: int
+    last_accessed_at: str | None = None
@@ -0,0 +1,225 @@
+"""Streaming import and export of the `urls` table, driven by `python -m app.cli`
+
+Import reads CSV (with a header row) or JSONL records of long_url, short_code and optional
+expires_at, batch_size at a time. Each batch is COPY'd into a temporary staging table
+(executemany on SQLite) and merged into `urls` with one INSERT ... SELECT ... ON CONFLICT DO
+NOTHING, then committed: a row whose long URL (ix_urls_long_url_hash) or short code
+(ix_urls_short_code) is already stored keeps the stored mapping and counts as skipped.
+Memory is bounded by one batch whatever the input size.
+
+Export streams the table through a server-side cursor, batch_size rows at a time, in the
+format import reads, so memory stays constant too.
+"""
+import csv
+import io
+import logging
+import time
+from dataclasses import dataclass
+from uuid import uuid4
+import orjson
+from sqlalchemy import Column, DateTime, LargeBinary, MetaData, String, Table, Uuid, select, true
+from app.core.config import settings
+from app.database.database import dialect_insert, engine
+from app.database.redis import get_redis
+from app.utils.expiry import as_naive_utc
+from app.utils.url_digest import long_url_digest
+from app.utils.url_generator import is_valid_short_code
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ("long_url", "short_code", "expires_at")
+
+# Rows per staged batch / per export fetch
+DEFAULT_BATCH_SIZE = 50_000
+
+# Postgres empties it at every commit (temporary tables are never autovacuumed)
+staging = Table(
+    "urls_import", MetaData(),
+    Column("id", Uuid),
+    Column("long_url", String),
+    Column("long_url_hash", LargeBinary),
+    Column("short_code", String),
+    Column("expires_at", DateTime),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS",
+)
+
+
+@dataclass
+class TransferStats:
+    rows: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    rejected: int = 0
+    started: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+def read_records(stream, fmt: str):
+    """Dicts from a CSV (header row naming the columns) or JSONL text stream"""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield orjson.loads(line)
+
+
+def _staging_row(record: dict) -> dict | None:
+    """Row for the staging table, None if the record cannot be imported"""
+    long_url, short_code = record.get("long_url"), record.get("short_code")
+    # Codes outside the base62 charset would be stored but never reachable through a redirect
+    if not long_url or not short_code or not is_valid_short_code(short_code):
+        return None
+    expires_at = record.get("expires_at") or None
+    if expires_at is not None:
+        try:
+            expires_at = as_naive_utc(expires_at)
+        except (TypeError, ValueError):
+            return None
+    return {
+        "id": uuid4(),
+        "long_url": long_url,
+        "long_url_hash": long_url_digest(long_url),
+        "short_code": short_code,
+        "expires_at": expires_at,
+    }
+
+
+def _copy_rows(conn, rows: list[dict]):
+    """Load a batch into the staging table: COPY on Postgres, executemany elsewhere"""
+    if conn.dialect.name != "postgresql":
+        conn.execute(staging.insert(), rows)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((
+            row["id"],
+            row["long_url"],
+            "\\x" + row["long_url_hash"].hex(),
+            row["short_code"],
+            # An unquoted empty field is NULL in COPY's csv format
+            row["expires_at"].isoformat() if row["expires_at"] else "",
+        ))
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging.name} (id, long_url, long_url_hash, short_code, expires_at) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _merge(conn) -> list[str]:
+    """Insert staged rows that clash with no stored long URL or short code; returns their codes"""
+    from app.models.url import URL
+
+    columns = ("id", "long_url", "long_url_hash", "short_code", "expires_at")
+    # The WHERE keeps SQLite from parsing ON CONFLICT as part of the SELECT
+    rows = select(*(staging.c[name] for name in columns)).where(true())
+    stmt = dialect_insert(conn, URL).from_select(columns, rows).on_conflict_do_nothing().returning(URL.short_code)
+    codes = list(conn.execute(stmt).scalars())
+    if conn.dialect.name != "postgresql":
+        conn.execute(staging.delete())
+    conn.commit()
+    return codes
+
+
+def _clear_negative_entries(short_codes: list[str]):
+    """Drop Redis entries recording the imported codes as missing"""
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for short_code in short_codes:
+                pipe.unlink(f"url:{short_code}")
+            pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not clear cached misses for imported codes: {e}")
+
+
+def _announce_reset():
+    """Have every running worker clear L1 and reload its short code filter"""
+    from app.services.local_cache import RESET_MESSAGE
+
+    try:
+        get_redis().publish(settings.CACHE_INVALIDATION_CHANNEL, RESET_MESSAGE)
+    except Exception as e:
+        logger.warning(f"Could not notify workers of the import, restart them to pick up the new codes: {e}")
+
+
+def import_urls(stream, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE) -> TransferStats:
+    stats = TransferStats(started=time.perf_counter())
+
+    # One connection throughout: the staging table only exists on the connection that created it
+    with engine.connect() as conn:
+        staging.create(conn)
+        conn.commit()
+
+        batch = []
+        for record in read_records(stream, fmt):
+            stats.rows += 1
+            row = _staging_row(record)
+            if row is None:
+                stats.rejected += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _import_batch(conn, batch, stats)
+                batch = []
+        if batch:
+            _import_batch(conn, batch, stats)
+
+        staging.drop(conn)
+        conn.commit()
+
+    if stats.inserted:
+        _announce_reset()
+    return stats
+
+
+def _import_batch(conn, batch: list[dict], stats: TransferStats):
+    _copy_rows(conn, batch)
+    codes = _merge(conn)
+    _clear_negative_entries(codes)
+
+    stats.inserted += len(codes)
+    stats.skipped += len(batch) - len(codes)
+    logger.info(
+        f"{stats.rows} rows read: {stats.inserted} inserted, {stats.skipped} skipped, "
+        f"{stats.rejected} rejected ({stats.rate:,.0f} rows/s)"
+    )
+
+
+def export_urls(stream, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE) -> TransferStats:
+    from app.models.url import URL
+
+    stats = TransferStats(started=time.perf_counter())
+    writer = csv.writer(stream) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(FIELDS)
+
+    with engine.connect() as conn:
+        # stream_results: a named (server-side) cursor on psycopg2, fetched batch_size rows at a time
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            select(URL.long_url, URL.short_code, URL.expires_at)
+        )
+        for rows in result.partitions():
+            for long_url, short_code, expires_at in rows:
+                if writer is not None:
+                    writer.writerow((long_url, short_code, expires_at.isoformat() if expires_at else ""))
+                else:
+                    stream.write(orjson.dumps({"long_url": long_url, "short_code": short_code, "expires_at": expires_at}).decode())
+                    stream.write("\n")
+            stats.rows += len(rows)
+            logger.info(f"{stats.rows} rows exported ({stats.rate:,.0f} rows/s)")
+
+    return stats
@@ -1,59 +1,304 @@
+import asyncio
+import math
+import random
+import time
 import orjson
 from typing import Optional
-from app.database.redis import get_redis
+from app.database.redis import get_redis, get_async_redis
 from app.core.config import settings
+from app.core.metrics import cache_lookups
+from app.core.server_timing import phase
+from app.services.local_cache import l1_invalidator
+from app.utils.expiry import seconds_until
+
+# Redis value marking a short code known not to exist
+NEGATIVE_ENTRY = "-"
+
+# Long URL index: hashes named by the first bytes of urls.long_url_hash, with the remaining bytes
+# as fields and the link as value. 65536 buckets keep each one small enough for Redis' listpack
+# encoding up to a few million links. Each field expires CACHE_TTL after it was last written
+# (HEXPIRE, Redis 7.4+), so the index holds recently created or requested long URLs only.
+LONG_URL_INDEX_PREFIX = "longurl:"
+LONG_URL_BUCKET_BYTES = 2
+
+
+def _long_url_slot(digest: bytes) -> tuple[str, bytes]:
+    return f"{LONG_URL_INDEX_PREFIX}{digest[:LONG_URL_BUCKET_BYTES].hex()}", digest[LONG_URL_BUCKET_BYTES:]
+
 
 class CacheService:
     
+    # Returned by lookups when Redis holds a negative entry for the short code
+    NOT_FOUND = object()
+    
+    # Returned by get_url_from_cache_async(miss=MISS) when Redis holds no entry at all
+    MISS = object()
+    
+    # Polls of Redis while another worker holds the fill lock
+    FILL_POLL_INTERVAL = 0.01
+    
+    @staticmethod
+    def _serialize(url_data, ttl: int) -> bytes:
+        data = {
+            'long_url': url_data.long_url,
+            'short_code': url_data.short_code,
+            'expires_at': str(url_data.expires_at) if url_data.expires_at else None
+        }
+        # Entries that expire before the link does carry their deadline, for early refresh
+        if ttl == settings.CACHE_TTL:
+            data['exp'] = time.time() + ttl
+        return orjson.dumps(data)
+    
+    @staticmethod
+    def should_refresh_early(cached_data: dict) -> bool:
+        """XFetch: true with a probability rising towards 1 as the Redis entry nears its expiry"""
+        exp = cached_data.get('exp')
+        if exp is None or settings.CACHE_EARLY_REFRESH <= 0:
+            return False
+        window = settings.CACHE_TTL * settings.CACHE_EARLY_REFRESH
+        return time.time() - window * math.log(1.0 - random.random()) >= exp
+    
+    @staticmethod
+    def _ttl(url_data, ttl: int) -> int:
+        """Cache TTL capped at the link's remaining lifetime, so expired links are never served"""
+        remaining = seconds_until(url_data.expires_at)
+        if remaining is None:
+            return ttl
+        return min(ttl, int(remaining))
+    
     @staticmethod
     def get_url_from_cache(short_code: str) -> Optional[dict]:
         """Get URL data from Redis cache"""
         try:
             redis_client = get_redis()
-            cached_data = redis_client.get(f"url:{short_code}")
+            with phase("redis"):
+                cached_data = redis_client.get(f"url:{short_code}")
+            
+            if cached_data == NEGATIVE_ENTRY:
+                cache_lookups.inc("redis", "negative")
+                return CacheService.NOT_FOUND
+            if cached_data:
+                cache_lookups.inc("redis", "hit")
+                return orjson.loads(cached_data)
+            cache_lookups.inc("redis", "miss")
+        except Exception:
+            cache_lookups.inc("redis", "error")  # Fallback to database
+        return None
+    
+    @staticmethod
+    async def get_url_from_cache_async(short_code: str, count_miss: bool = True, miss=None) -> Optional[dict]:
+        """Get URL data from Redis cache without blocking the event loop
+
+        count_miss=False leaves counting a miss to the lookup that follows it up. A miss
+        returns `miss`, so callers can tell it from an error (always None).
+        """
+        try:
+            redis_client = get_async_redis()
+            with phase("redis"):
+                cached_data = await redis_client.get(f"url:{short_code}")
             
+            if cached_data == NEGATIVE_ENTRY:
+                cache_lookups.inc("redis", "negative")
+                return CacheService.NOT_FOUND
             if cached_data:
+                cache_lookups.inc("redis", "hit")
                 return orjson.loads(cached_data)
+            if count_miss:
+                cache_lookups.inc("redis", "miss")
+            return miss
         except Exception:
-            pass  # Fail silently, fallback to database
+            cache_lookups.inc("redis", "error")  # Fallback to database
         return None
     
     @staticmethod
     def cache_url(short_code: str, url_data):
         """Cache URL data in Redis with pipeline for better performance"""
         try:
-            if url_data:
+            ttl = CacheService._ttl(url_data, settings.CACHE_TTL) if url_data else 0
+            if ttl > 0:
                 redis_client = get_redis()
-                cache_data = {
-                    'long_url': url_data.long_url,
-                    'short_code': url_data.short_code,
-                    'expires_at': str(url_data.expires_at) if url_data.expires_at else None
-                }
                 
                 # Use pipeline for atomic operations
                 pipe = redis_client.pipeline()
                 pipe.setex(
                     f"url:{short_code}",
-                    settings.CACHE_TTL,
-                    orjson.dumps(cache_data)
+                    ttl,
+                    CacheService._serialize(url_data, ttl)
                 )
-                # Also cache reverse lookup for analytics
+                pipe.execute()
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def cache_url_async(short_code: str, url_data):
+        """Cache URL data in Redis with an async pipeline"""
+        try:
+            ttl = CacheService._ttl(url_data, settings.CACHE_TTL) if url_data else 0
+            if ttl > 0:
+                redis_client = get_async_redis()
+                
+                pipe = redis_client.pipeline()
                 pipe.setex(
-                    f"reverse:{hash(url_data.long_url)}",
-                    settings.CACHE_TTL // 2,
-                    short_code
+                    f"url:{short_code}",
+                    ttl,
+                    CacheService._serialize(url_data, ttl)
                 )
-                pipe.execute()
+                await pipe.execute()
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def cache_many_async(url_results):
+        """Cache a batch of URL results in Redis with one pipeline"""
+        if not url_results:
+            return
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for url_data in url_results:
+                ttl = CacheService._ttl(url_data, settings.CACHE_TTL)
+                if ttl > 0:
+                    pipe.setex(f"url:{url_data.short_code}", ttl, CacheService._serialize(url_data, ttl))
+            await pipe.execute()
         except Exception:
             pass  # Fail silently
     
+    @staticmethod
+    async def find_long_url_async(digest: bytes) -> Optional[dict]:
+        """Link already shortening the long URL with this digest, from the Redis index; None if not indexed
+
+        Entries older than CACHE_TTL are ignored and dropped: a delete whose HDEL was lost
+        (Redis down, crash after the commit) leaves one behind until its field expires, and
+        it must not be served meanwhile. The database path that follows rewrites the entry.
+        """
+        if not settings.LONG_URL_INDEX_ENABLED:
+            return None
+        try:
+            key, field = _long_url_slot(digest)
+            with phase("redis"):
+                indexed = await get_async_redis().hget(key, field)
+            if not indexed:
+                return None
+            data = orjson.loads(indexed)
+            if time.time() - data.get('at', 0) < settings.CACHE_TTL:
+                return data
+            await get_async_redis().hdel(key, field)
+            return None
+        except Exception:
+            return None  # Fallback to database
+    
+    @staticmethod
+    async def index_long_url_async(digest: bytes, url_data):
+        """Record which link shortens a long URL, so creating it again needs no database lookup"""
+        await CacheService.index_long_urls_async([(digest, url_data)])
+    
+    @staticmethod
+    def _serialize_indexed(url_data) -> bytes:
+        data = {
+            'short_code': url_data.short_code,
+            'expires_at': str(url_data.expires_at) if url_data.expires_at else None,
+            'at': time.time()
+        }
+        # Without normalization the stored long URL is the one being shortened, byte for byte
+        if settings.NORMALIZE_LONG_URLS:
+            data['long_url'] = url_data.long_url
+        return orjson.dumps(data)
+    
+    @staticmethod
+    async def index_long_urls_async(entries):
+        """Index a batch of (digest, url_data) pairs with one pipeline"""
+        if not entries or not settings.LONG_URL_INDEX_ENABLED:
+            return
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for digest, url_data in entries:
+                key, field = _long_url_slot(digest)
+                pipe.hset(key, field, CacheService._serialize_indexed(url_data))
+                pipe.hexpire(key, settings.CACHE_TTL, field)
+            await pipe.execute()
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def unindex_long_urls_async(digests):
+        """Drop deleted links from the long URL index"""
+        if not digests or not settings.LONG_URL_INDEX_ENABLED:
+            return
+        try:
+            pipe = get_async_redis().pipeline(transaction=False)
+            for digest in digests:
+                pipe.hdel(*_long_url_slot(digest))
+            await pipe.execute()
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def cache_miss_async(short_code: str):
+        """Remember briefly in Redis that a short code does not exist"""
+        try:
+            redis_client = get_async_redis()
+            await redis_client.set(f"url:{short_code}", NEGATIVE_ENTRY, ex=settings.NEGATIVE_CACHE_TTL, nx=True)
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def acquire_fill_lock_async(short_code: str) -> bool:
+        """Claim loading a short code into Redis for CACHE_FILL_LOCK_MS; True if Redis is unreachable"""
+        try:
+            redis_client = get_async_redis()
+            return bool(await redis_client.set(f"lock:url:{short_code}", 1, px=settings.CACHE_FILL_LOCK_MS, nx=True))
+        except Exception:
+            return True
+    
+    @staticmethod
+    async def wait_for_fill_async(short_code: str) -> Optional[dict]:
+        """Poll Redis while another worker loads the short code; None if it did not appear in time"""
+        deadline = time.monotonic() + settings.CACHE_FILL_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(CacheService.FILL_POLL_INTERVAL)
+            cached_data = await CacheService.get_url_from_cache_async(short_code)
+            if cached_data:
+                return cached_data
+        return None
+    
     @staticmethod
     def invalidate_cache(short_code: str):
-        """Remove URL from cache with pipeline"""
+        """Remove URL from Redis and broadcast the L1 eviction to every worker"""
+        l1_invalidator.evict(short_code)
         try:
             redis_client = get_redis()
             pipe = redis_client.pipeline()
             pipe.delete(f"url:{short_code}")
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, short_code)
             pipe.execute()
         except Exception:
-            pass  # Fail silently
\ No newline at end of file
+            pass  # Fail silently
+    
+    @staticmethod
+    async def invalidate_cache_async(short_code: str):
+        """Remove URL from Redis and broadcast the L1 eviction without blocking the event loop"""
+        l1_invalidator.evict(short_code)
+        try:
+            redis_client = get_async_redis()
+            pipe = redis_client.pipeline()
+            pipe.delete(f"url:{short_code}")
+            pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, short_code)
+            await pipe.execute()
+        except Exception:
+            pass  # Fail silently
+    
+    @staticmethod
+    async def invalidate_many_async(short_codes):
+        """Invalidate and broadcast a batch of short codes in one pipeline"""
+        if not short_codes:
+            return
+        for short_code in short_codes:
+            l1_invalidator.evict(short_code)
+        try:
+            redis_client = get_async_redis()
+            pipe = redis_client.pipeline(transaction=False)
+            for short_code in short_codes:
+                pipe.delete(f"url:{short_code}")
+                pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, short_code)
+            await pipe.execute()
+        except Exception:
+            pass  # Fail silently
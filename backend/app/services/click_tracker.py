@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import func, select
+from app.database.database import AsyncSessionLocal, dialect_insert
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ClickTracker:
+    """Counts redirects in process and writes them behind to url_clicks
+
+    `record` is one dict update, so the redirect path (including L1 hits) never waits on
+    I/O. Each code maps to (count, last access) in a single entry: `record` also runs on
+    threadpool threads (USE_ASYNC_REDIRECT=False), and a flush swapping the dict out
+    between two separate writes would see one without the other.
+
+    A background task swaps the counters out every `flush_interval` seconds and applies
+    them with one batched upsert; counts from every worker add up in the table. Only codes
+    still in urls are written, so a delete leaves no orphan row for a reused alias to
+    inherit. Counts that fail to flush are merged back and retried next time.
+    """
+
+    # Rows per multi-row upsert statement
+    FLUSH_CHUNK_SIZE = 1000
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._clicks: dict[str, tuple[int, float]] = {}
+        self._task: asyncio.Task | None = None
+
+    def record(self, short_code: str):
+        count, _ = self._clicks.get(short_code, (0, 0.0))
+        self._clicks[short_code] = (count + 1, time.time())
+
+    async def flush(self):
+        from app.models.url import URL
+        from app.models.url_click import URLClick
+
+        if not self._clicks:
+            return
+
+        clicks, self._clicks = self._clicks, {}
+
+        # Sorted so concurrent flushes from several workers lock rows in the same order
+        rows = [
+            {
+                "short_code": short_code,
+                "clicks": count,
+                "last_accessed_at": datetime.fromtimestamp(last_access, timezone.utc).replace(tzinfo=None),
+            }
+            for short_code, (count, last_access) in sorted(clicks.items())
+        ]
+
+        try:
+            async with AsyncSessionLocal() as db:
+                greatest = func.max if db.bind.dialect.name == "sqlite" else func.greatest
+                for start in range(0, len(rows), self.FLUSH_CHUNK_SIZE):
+                    chunk = rows[start:start + self.FLUSH_CHUNK_SIZE]
+                    # Share-locked until the commit: a delete_url either waits and then removes
+                    # the rows written here, or has already removed the link and hides it
+                    live = set((await db.execute(
+                        select(URL.short_code)
+                        .where(URL.short_code.in_([row["short_code"] for row in chunk]))
+                        .order_by(URL.short_code)
+                        .with_for_update(read=True)
+                    )).scalars())
+                    chunk = [row for row in chunk if row["short_code"] in live]
+                    if not chunk:
+                        continue
+                    stmt = dialect_insert(db, URLClick).values(chunk)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[URLClick.short_code],
+                        set_={
+                            "clicks": URLClick.clicks + stmt.excluded.clicks,
+                            "last_accessed_at": greatest(URLClick.last_accessed_at, stmt.excluded.last_accessed_at),
+                        }
+                    )
+                    await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Click flush failed, retrying {len(rows)} codes next interval: {e}")
+            for short_code, (count, last_access) in clicks.items():
+                newer_count, newer_access = self._clicks.get(short_code, (0, last_access))
+                self._clicks[short_code] = (count + newer_count, max(last_access, newer_access))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Keep the task alive: a dead flusher would let _clicks grow without bound
+                logger.error(f"Click flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Final flush so a clean shutdown loses nothing
+        await self.flush()
+
+
+click_tracker = ClickTracker(settings.CLICK_FLUSH_INTERVAL)
@@ -0,0 +1,53 @@
+import asyncio
+import hashlib
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.utils.url_generator import encode_base62, permute_id
+
+
+class ShortCodeAllocator:
+    """Hands out unique short codes from blocks of IDs leased from a Postgres sequence
+
+    Each lease is one nextval() on a sequence whose increment is the block size, so a
+    worker owns [value, value + increment) outright: codes need no collision lookups and
+    no two workers (or restarts) can ever hand out the same ID. Unused IDs of a block
+    are simply skipped when the worker exits.
+    """
+
+    def __init__(self, sequence, length: int, key: bytes | None = None):
+        self.sequence = sequence
+        self.length = length
+        self.key = key
+        self._next_id = 0
+        self._block_end = 0
+        self._lock = asyncio.Lock()
+
+    async def _lease(self, db: AsyncSession):
+        start = await db.scalar(self.sequence.next_value())
+        self._next_id, self._block_end = start, start + self.sequence.increment
+
+    async def next_id(self, db: AsyncSession) -> int:
+        async with self._lock:
+            if self._next_id >= self._block_end:
+                await self._lease(db)
+            allocated = self._next_id
+            self._next_id += 1
+            return allocated
+
+    def encode(self, allocated_id: int) -> str:
+        if self.key is not None:
+            allocated_id = permute_id(allocated_id, self.key, self.length)
+        return encode_base62(allocated_id, self.length)
+
+    async def next_code(self, db: AsyncSession) -> str:
+        return self.encode(await self.next_id(db))
+
+
+def _create_allocator() -> ShortCodeAllocator:
+    from app.models.url import url_code_seq
+
+    key = hashlib.sha256(settings.SECRET_KEY.encode('utf-8')).digest() if settings.OBFUSCATE_SHORT_CODES else None
+    return ShortCodeAllocator(url_code_seq, settings.SHORT_CODE_LENGTH, key)
+
+
+code_allocator = _create_allocator()
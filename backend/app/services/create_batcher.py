@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import NamedTuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PendingCreate(NamedTuple):
+    """One queued create, shaped like the URLCreate items bulk_create_short_urls takes"""
+    original_url: str
+    custom_alias: str | None
+    expires_in_days: int
+
+
+class CreateBatcher:
+    """Group commit for single creates (CREATE_BATCH_ENABLED)
+
+    `submit` queues a create and waits on its own future. A writer task collects the creates
+    arriving within `max_delay` seconds of the first one (fewer if `max_batch` queue up
+    first) and writes them with bulk_create_short_urls: one multi-row INSERT ... RETURNING
+    and one commit for the whole batch, instead of a commit and a refresh SELECT per link.
+    Creates queued while a batch is being written go out as soon as it is done.
+
+    Each future resolves as create_short_url would have: with the new row, or with
+    URLAlreadyExistsError / ShortCodeAlreadyExistsError / NoFreeShortCodeError. A create
+    repeating a long URL whose first occurrence in the batch failed is queued again on its
+    own; a batch that fails as a whole fails every create in it. bulk_create_short_urls
+    indexes the links it creates or finds.
+    """
+
+    def __init__(self, max_delay: float, max_batch: int):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._pending: list[tuple[PendingCreate, asyncio.Future]] = []
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    async def submit(self, original_url: str, short_code: str | None, expires_in_days: int):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((PendingCreate(original_url, short_code, expires_in_days), future))
+        self._arrived.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def flush(self, batch):
+        from app.database.database import AsyncSessionLocal
+        from app.services.url_service import (
+            URLService, URLAlreadyExistsError, ShortCodeAlreadyExistsError, NoFreeShortCodeError,
+            BULK_CREATED, BULK_EXISTING, BULK_URL_EXISTS, BULK_ALIAS_CONFLICT, BULK_NO_FREE_CODE
+        )
+
+        try:
+            async with AsyncSessionLocal() as db:
+                outcomes = await URLService.bulk_create_short_urls(db, [item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Create batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        retry = []
+        for (item, future), (status, url) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if status == BULK_CREATED:
+                future.set_result(url)
+            elif status in (BULK_EXISTING, BULK_URL_EXISTS):
+                future.set_exception(URLAlreadyExistsError(url))
+            elif status == BULK_ALIAS_CONFLICT:
+                future.set_exception(ShortCodeAlreadyExistsError("Custom alias already exists"))
+            elif status == BULK_NO_FREE_CODE:
+                future.set_exception(NoFreeShortCodeError("Could not allocate a free short code"))
+            else:
+                # BULK_DUPLICATE: its first occurrence was an alias conflict; on its own it may succeed
+                retry.append((item, future))
+
+        if retry:
+            self._pending[:0] = retry
+            self._arrived.set()
+
+    async def run(self):
+        while True:
+            if not self._pending:
+                if self._closing:
+                    return
+                self._arrived.clear()
+                await self._arrived.wait()
+                if not self._pending:
+                    continue
+                # First create after an idle spell: let concurrent ones join it for up to max_delay
+                self._full.clear()
+                if len(self._pending) < self.max_batch:
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.max_delay)
+                    except asyncio.TimeoutError:
+                        pass
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            await self.flush(batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Let the writer finish what is queued, so no caller is left waiting, then end it"""
+        if self._task is not None:
+            self._closing = True
+            self._arrived.set()
+            self._full.set()
+            await self._task
+            self._task = None
+            self._closing = False
+
+
+create_batcher = CreateBatcher(settings.CREATE_BATCH_MAX_DELAY_MS / 1000, settings.CREATE_BATCH_MAX_SIZE)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import urllib.request
+from app.core.config import settings
+from app.core.redirect_cache import surrogate_key
+
+logger = logging.getLogger(__name__)
+
+
+class EdgePurger:
+    """Removes cached redirects from a CDN or reverse proxy by surrogate key ("none" backend)"""
+
+    async def purge(self, keys: list[str]):
+        pass
+
+
+class HTTPEdgePurger(EdgePurger):
+    """POSTs the keys, space-separated in a Surrogate-Key header, to one purge URL ("http" backend)
+
+    That is Fastly's purge-by-surrogate-key API (POST /service/<id>/purge with a Fastly-Key
+    token); benchmarks.purge_stub accepts the same request locally. urllib runs in a
+    thread, so a slow purge API never blocks the event loop.
+    """
+
+    def __init__(self, url: str, token: str | None = None, token_header: str = "Fastly-Key", timeout: float = 5.0):
+        self.url = url
+        self.token = token
+        self.token_header = token_header
+        self.timeout = timeout
+
+    def _post(self, keys: list[str]):
+        headers = {"Surrogate-Key": " ".join(keys)}
+        if self.token:
+            headers[self.token_header] = self.token
+        request = urllib.request.Request(self.url, method="POST", headers=headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    async def purge(self, keys: list[str]):
+        await asyncio.to_thread(self._post, keys)
+
+
+def build_purger(backend: str) -> EdgePurger:
+    """Build the EDGE_PURGER backend: "none" or "http" """
+    if backend == "none":
+        return EdgePurger()
+    if backend == "http":
+        if not settings.EDGE_PURGE_URL:
+            raise ValueError("EDGE_PURGER=http needs EDGE_PURGE_URL")
+        return HTTPEdgePurger(settings.EDGE_PURGE_URL, settings.EDGE_PURGE_TOKEN, settings.EDGE_PURGE_TOKEN_HEADER, settings.EDGE_PURGE_TIMEOUT)
+    raise ValueError(f"Unknown edge purger backend: {backend}")
+
+
+edge_purger = build_purger(settings.EDGE_PURGER)
+
+
+async def purge_links(short_codes: list[str]):
+    """Drop deleted links' redirects from the edge; a failure is logged, the delete stands"""
+    if not short_codes:
+        return
+    try:
+        await edge_purger.purge([surrogate_key(short_code) for short_code in short_codes])
+    except Exception as e:
+        logger.error(f"Edge purge failed for {len(short_codes)} links, they stay cached up to REDIRECT_EDGE_MAX_AGE: {e}")
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from sqlalchemy import delete, select
+from app.database.database import AsyncSessionLocal
+from app.utils.expiry import utcnow
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ExpirySweeper:
+    """Deletes expired links in bounded batches, invalidating both cache tiers and the long URL index
+
+    Each batch claims rows with FOR UPDATE SKIP LOCKED, so every worker can run a sweeper:
+    concurrent sweepers split the work instead of blocking on each other.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def sweep_batch(self) -> int:
+        """Delete up to batch_size expired links in one transaction; returns how many went"""
+        from app.models.url import URL
+        from app.models.url_click import URLClick
+        from app.services.cache_service import CacheService
+
+        expired = (
+            select(URL.id)
+            .where(URL.expires_at < utcnow())
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+
+        async with AsyncSessionLocal() as db:
+            deleted = (await db.execute(
+                delete(URL).where(URL.id.in_(expired)).returning(URL.short_code, URL.long_url_hash)
+            )).all()
+            short_codes = [row.short_code for row in deleted]
+            if short_codes:
+                await db.execute(delete(URLClick).where(URLClick.short_code.in_(short_codes)))
+            await db.commit()
+
+        await CacheService.invalidate_many_async(short_codes)
+        await CacheService.unindex_long_urls_async([row.long_url_hash for row in deleted])
+        return len(short_codes)
+
+    async def sweep(self) -> int:
+        """Delete every currently expired link, batch by batch"""
+        total = 0
+        while True:
+            deleted = await self.sweep_batch()
+            total += deleted
+            if deleted < self.batch_size:
+                return total
+            # Let other work on the loop run between batches
+            await asyncio.sleep(0)
+
+    async def run(self):
+        while True:
+            try:
+                deleted = await self.sweep()
+                if deleted:
+                    logger.info(f"Expiry sweep removed {deleted} links")
+            except Exception as e:
+                logger.error(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+expiry_sweeper = ExpirySweeper(settings.EXPIRY_SWEEP_INTERVAL, settings.EXPIRY_SWEEP_BATCH_SIZE)
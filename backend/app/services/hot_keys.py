@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+import orjson
+from sqlalchemy import select
+from app.database.database import AsyncSessionLocal
+from app.database.redis import get_async_redis
+from app.services.local_cache import cache_url_locally
+from app.utils.expiry import is_expired
+from app.utils.top_k import TopK
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HotKeyTracker:
+    """Finds the most redirected short codes and pre-loads them into L1 at startup
+
+    Each worker counts redirects in a TopK sketch and every `persist_interval` seconds
+    merges its window into one shared Redis sorted set, which decays on every merge so
+    old traffic fades out and is trimmed to `size` members. A starting worker reads the
+    set, loads the codes with one MGET (plus one IN query for those Redis no longer has)
+    and fills L1 and Redis before accepting requests. `record` also runs on threadpool
+    threads (USE_ASYNC_REDIRECT=False), so the sketch is only touched under a lock.
+    """
+
+    def __init__(self, key: str, size: int, persist_interval: float, decay: float):
+        self.key = key
+        self.size = size
+        self.persist_interval = persist_interval
+        self.decay = decay
+        self.sketch = TopK(size)
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def record(self, short_code: str):
+        with self._lock:
+            self.sketch.add(short_code)
+
+    async def persist(self):
+        if not self.sketch.counts:
+            return
+
+        with self._lock:
+            top = self.sketch.top()
+            self.sketch.clear()
+        try:
+            pipe = get_async_redis().pipeline()
+            pipe.zunionstore(self.key, {self.key: self.decay})
+            for short_code, count in top:
+                pipe.zincrby(self.key, count, short_code)
+            pipe.zremrangebyrank(self.key, 0, -(self.size + 1))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Hot key snapshot not saved: {e}")
+
+    async def warm(self) -> int:
+        """Load the snapshot's short codes into L1 (and Redis where missing); returns how many"""
+        from app.models.url import URL
+        from app.services.cache_service import CacheService, NEGATIVE_ENTRY
+        from app.services.url_service import URLResult
+
+        try:
+            redis_client = get_async_redis()
+            short_codes = await redis_client.zrevrange(self.key, 0, self.size - 1)
+            if not short_codes:
+                return 0
+
+            warmed = 0
+            uncached = []
+            for short_code, cached_data in zip(short_codes, await redis_client.mget([f"url:{code}" for code in short_codes])):
+                if cached_data is None:
+                    uncached.append(short_code)
+                elif cached_data != NEGATIVE_ENTRY:
+                    data = orjson.loads(cached_data)
+                    if not is_expired(data.get('expires_at')):
+                        cache_url_locally(short_code, data['long_url'], data.get('expires_at'))
+                        warmed += 1
+
+            if uncached:
+                async with AsyncSessionLocal() as db:
+                    rows = (await db.execute(
+                        select(URL.long_url, URL.short_code, URL.expires_at).where(URL.short_code.in_(uncached))
+                    )).all()
+                results = [URLResult(row.long_url, row.short_code, row.expires_at) for row in rows if not is_expired(row.expires_at)]
+                for result in results:
+                    cache_url_locally(result.short_code, result.long_url, result.expires_at)
+                await CacheService.cache_many_async(results)
+                warmed += len(results)
+
+            logger.info(f"Warmed L1 with {warmed} hot short codes")
+            return warmed
+        except Exception as e:
+            logger.warning(f"Cache warming skipped: {e}")
+            return 0
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.persist()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Final save so the workers replacing this one warm from current traffic
+        await self.persist()
+
+
+hot_keys = HotKeyTracker(settings.HOT_KEYS_REDIS_KEY, settings.HOT_KEYS_SIZE, settings.HOT_KEYS_PERSIST_INTERVAL, settings.HOT_KEYS_DECAY)
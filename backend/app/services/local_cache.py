@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import math
+import time
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy import select
+from app.database.redis import get_async_redis
+from app.database.database import AsyncSessionLocal
+from app.utils.bloom_filter import BloomFilter
+from app.utils.compact_cache import CompactURLCache
+from app.utils.expiry import seconds_until
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Invalidation message meaning "many codes changed": every worker clears L1 and reloads its filter
+RESET_MESSAGE = "*"
+
+
+def _l1_expiry(short_code, entry, now):
+    # Entries are (long_url, deadline): kept for L1_CACHE_TTL but never past the link's expiry
+    return min(now + settings.L1_CACHE_TTL, entry[1])
+
+
+def _create_url_cache():
+    if settings.L1_CACHE_BACKEND == "compact":
+        return CompactURLCache(settings.L1_CACHE_BYTES, settings.L1_CACHE_TTL, timer=time.monotonic)
+    if settings.L1_CACHE_BACKEND == "shared":
+        from app.utils.shared_table import SharedURLTable
+        return SharedURLTable(settings.SHARED_L1_PATH, settings.SHARED_L1_SLOTS, settings.SHARED_L1_SLOT_BYTES, settings.L1_CACHE_TTL)
+    if settings.L1_CACHE_BACKEND == "ttl":
+        return TLRUCache(maxsize=settings.L1_CACHE_SIZE, ttu=_l1_expiry, timer=time.monotonic)
+    raise ValueError(f"Unknown L1 cache backend: {settings.L1_CACHE_BACKEND}")
+
+
+# In-memory (L1) cache for hot URLs, kept coherent across workers by L1Invalidator. With the
+# "shared" backend every worker on the host maps one table, so each applies invalidations to it
+# redundantly, and only RESET_MESSAGE clears it: a worker (re)subscribing leaves it to the others.
+url_cache = _create_url_cache()
+
+# Negative L1: short codes recently looked up and not found
+missing_codes = TTLCache(maxsize=settings.NEGATIVE_CACHE_SIZE, ttl=settings.NEGATIVE_CACHE_TTL)
+
+# Short codes created or deleted in the last READ_YOUR_WRITES_WINDOW; their lookups skip the read replicas
+recent_writes = TTLCache(maxsize=settings.NEGATIVE_CACHE_SIZE, ttl=settings.READ_YOUR_WRITES_WINDOW)
+
+
+def get_cached_link(short_code: str) -> tuple[str, float | None] | None:
+    """(long URL, seconds until the link expires or None if it never does) from L1, None on a miss"""
+    entry = url_cache.get(short_code)
+    if entry is None:
+        return None
+    long_url, deadline = entry
+    return long_url, (None if deadline == math.inf else deadline - time.monotonic())
+
+
+def cache_url_locally(short_code: str, long_url: str, expires_at=None):
+    """Store a resolved short code in L1 until L1_CACHE_TTL or the link's expires_at, whichever is first"""
+    remaining = seconds_until(expires_at)
+    if remaining is None:
+        url_cache[short_code] = (long_url, math.inf)
+    elif remaining > 0:
+        url_cache[short_code] = (long_url, time.monotonic() + remaining)
+
+
+class ShortCodeFilter:
+    """Bloom filter of every stored short code, used to reject unknown codes without any I/O"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.ready = False
+        self._pending: BloomFilter | None = None
+
+    def add(self, short_code: str):
+        self.bloom.add(short_code)
+        if self._pending is not None:
+            self._pending.add(short_code)
+
+    def might_exist(self, short_code: str) -> bool:
+        # Until a full load has completed the filter may have false negatives, so it admits everything
+        return not self.ready or short_code in self.bloom
+
+    async def rebuild(self):
+        """Load every short code from the database into a fresh filter, then swap it in"""
+        from app.models.url import URL
+
+        self.ready = False
+        self._pending = BloomFilter(self.capacity, self.error_rate)
+        try:
+            async with AsyncSessionLocal() as db:
+                codes = await db.stream_scalars(select(URL.short_code).execution_options(yield_per=10000))
+                async for short_code in codes:
+                    self._pending.add(short_code)
+
+            self.bloom, self._pending = self._pending, None
+            self.ready = True
+            if self.bloom.count > self.capacity:
+                logger.warning(f"Short code filter over capacity ({self.bloom.count}/{self.capacity}), false positive rate will rise")
+            logger.info(f"Short code filter loaded with {self.bloom.count} codes")
+        except Exception as e:
+            self._pending = None
+            logger.error(f"Short code filter load failed: {e}")
+
+
+short_code_filter = ShortCodeFilter(settings.SHORT_CODE_FILTER_CAPACITY, settings.SHORT_CODE_FILTER_ERROR_RATE)
+
+
+class L1Invalidator:
+    """Broadcasts short code changes over Redis pub/sub and applies the ones other workers send
+
+    A message means "this short code was created or deleted": it is evicted from the
+    positive and negative L1 caches, added to the short code filter and marked as
+    recently written. RESET_MESSAGE (never a valid short code) clears L1 and reloads the
+    filter instead, for bulk changes too large to announce code by code.
+
+    Subscribing, and losing the subscription, clear this worker's caches. `shared_caches`
+    (among `caches`, mapped by every worker on the host) are cleared by RESET_MESSAGE only:
+    clearing them whenever one worker starts or reconnects would empty them for all, and
+    the workers still subscribed keep applying invalidations to them meanwhile.
+    """
+
+    def __init__(self, caches, code_filter: ShortCodeFilter, recent_writes, channel: str, reconnect_delay: float = 1.0,
+                 shared_caches=()):
+        self.caches = caches
+        self.shared_caches = shared_caches
+        self.code_filter = code_filter
+        self.recent_writes = recent_writes
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._task: asyncio.Task | None = None
+        self._rebuild_task: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    def evict(self, short_code: str):
+        for cache in self.caches:
+            cache.pop(short_code, None)
+        self.code_filter.add(short_code)
+        self.recent_writes[short_code] = True
+
+    def _clear(self, shared: bool):
+        for cache in self.caches:
+            if shared or not any(cache is kept for kept in self.shared_caches):
+                cache.clear()
+
+    def _reset(self, shared: bool = False):
+        # Messages sent while we were not subscribed are lost: drop local state and reload the filter
+        self._clear(shared)
+        self.code_filter.ready = False
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+        self._rebuild_task = asyncio.create_task(self.code_filter.rebuild())
+
+    async def listen(self):
+        """Apply every short code published on the channel until cancelled"""
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._reset()
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    if message["data"] == RESET_MESSAGE:
+                        self._reset(shared=True)
+                    else:
+                        self.evict(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"L1 invalidation listener disconnected: {e}")
+                self._subscribed.clear()
+                self._clear(shared=False)
+                self.code_filter.ready = False
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.listen())
+
+    async def wait_subscribed(self, timeout: float) -> bool:
+        """Wait until L1 has been reset for a live subscription; anything this worker cached before then is dropped"""
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        for task in (self._task, self._rebuild_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._rebuild_task = None
+
+
+l1_invalidator = L1Invalidator(
+    (url_cache, missing_codes), short_code_filter, recent_writes, settings.CACHE_INVALIDATION_CHANNEL,
+    shared_caches=(url_cache,) if settings.L1_CACHE_BACKEND == "shared" else ()
+)
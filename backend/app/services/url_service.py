@@ -1,7 +1,21 @@
+import asyncio
+import base64
+import orjson
+from sqlalchemy import delete, func, select, text, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
 from app.utils.url_generator import generate_entropy_code
+from app.utils.expiry import utcnow, is_expired
+from app.utils.url_digest import long_url_digest
+from app.services.code_allocator import code_allocator
+from app.core.config import settings
+from app.core.metrics import cache_lookups
+from app.core.server_timing import phase
+from app.utils.single_flight import SingleFlight
+from app.database.database import dialect_insert
 
 
 class URLAlreadyExistsError(Exception):
@@ -14,128 +28,524 @@ class ShortCodeAlreadyExistsError(Exception):
     pass
 
 
+class NoFreeShortCodeError(Exception):
+    pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+# Per-item outcomes of URLService.bulk_create_short_urls
+BULK_CREATED = "created"
+BULK_EXISTING = "existing"  # long URL already shortened, existing code returned
+BULK_URL_EXISTS = "url_exists"  # custom alias requested for an already shortened long URL
+BULK_ALIAS_CONFLICT = "alias_conflict"
+BULK_DUPLICATE = "duplicate"  # repeats an earlier item in the same request that was not created
+BULK_NO_FREE_CODE = "no_free_code"  # every generated short code collided with a custom alias
+
+
+# request.state flag set by RedirectFastPath when Redis had no entry, so the route skips a second GET
+REDIS_MISSED = "redis_missed"
+
+# In-flight lookups and background early refreshes, keyed by short code
+url_lookups = SingleFlight()
+url_refreshes = SingleFlight()
+_background_refreshes: set = set()
+
+
+class URLResult:
+    """URL-like object returned by lookups served from cache or a column query"""
+
+    def __init__(self, long_url, short_code, expires_at):
+        self.long_url = long_url
+        self.short_code = short_code
+        self.expires_at = expires_at
+
+
+def _encode_cursor(url) -> str:
+    payload = orjson.dumps([url.created_at.isoformat(), str(url.id)])
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, url_id = orjson.loads(payload)
+        return datetime.fromisoformat(created_at), UUID(url_id)
+    except Exception:
+        raise InvalidCursorError("Invalid pagination cursor")
+
+
 class URLService:
-    
+
+    # Inserts retried when a generated code collides with an existing custom alias
+    MAX_INSERT_ATTEMPTS = 3
+
+    # Rows per multi-row INSERT (and per IN lookup) in bulk creates
+    BULK_CHUNK_SIZE = 1000
+
     @staticmethod
-    def create_short_url(db: Session, original_url: str, short_code: str = None, expires_in_days=30):
+    async def create_short_url(db: AsyncSession, original_url: str, short_code: str = None, expires_in_days=30):
         from app.models.url import URL
-        
+        from app.services.cache_service import CacheService
+        from app.services.local_cache import missing_codes
+
+        digest = long_url_digest(original_url)
+
+        # Long URLs shortened before are answered from the Redis index, without a database round trip,
+        # unless this worker has since found the code missing: then the entry outlived its link
+        indexed = await CacheService.find_long_url_async(digest)
+        if indexed and not is_expired(indexed['expires_at']) and indexed['short_code'] not in missing_codes:
+            raise URLAlreadyExistsError(URLResult(indexed.get('long_url', original_url), indexed['short_code'], indexed['expires_at']))
+
+        if settings.CREATE_BATCH_ENABLED:
+            from app.services.create_batcher import create_batcher
+            return await create_batcher.submit(original_url, short_code, expires_in_days)
+
         # Check if URL already exists when custom alias is provided
         if short_code:
-            existing_url = db.query(URL).filter(URL.long_url == original_url).first()
+            existing_url = (await db.execute(select(URL).where(URL.long_url_hash == digest))).scalars().first()
             if existing_url:
+                await CacheService.index_long_url_async(digest, existing_url)
                 raise URLAlreadyExistsError(existing_url)
-        
+
         # Generate short code if not provided
-        if not short_code:
-            short_code = URLService._generate_unique_short_code(db, original_url)
-        
-        try:
-            expires_at = datetime.now(timezone.utc) + timedelta(days=expires_in_days)
-            new_url = URL(long_url=original_url, short_code=short_code, expires_at=expires_at)
-            db.add(new_url)
-            db.commit()
-            db.refresh(new_url)
-            return new_url
-            
-        except IntegrityError as e:
-            db.rollback()
-            
-            error_str = str(e)
-            
-            if "ix_urls_long_url" in error_str:
-                # Find existing URL and return it via exception
-                existing_url = db.query(URL).filter(URL.long_url == original_url).first()
-                raise URLAlreadyExistsError(existing_url)
-            
-            elif "ix_urls_short_code" in error_str:
-                raise ShortCodeAlreadyExistsError("Custom alias already exists")
-            
-            # Re-raise for other integrity errors
-            raise
-    
-    @staticmethod
-    def _generate_unique_short_code(db: Session, original_url: str, max_attempts=5):
+        generated = not short_code
+        if generated:
+            short_code = await URLService._generate_unique_short_code(db, original_url)
+
+        expires_at = utcnow() + timedelta(days=expires_in_days)
+        for _ in range(URLService.MAX_INSERT_ATTEMPTS):
+            try:
+                new_url = URL(long_url=original_url, long_url_hash=digest, short_code=short_code, expires_at=expires_at)
+                db.add(new_url)
+                await db.commit()
+                await db.refresh(new_url)
+
+                # Clear negative cache entries and register the code in every worker's filter
+                await CacheService.invalidate_cache_async(short_code)
+                await CacheService.index_long_url_async(digest, new_url)
+                return new_url
+
+            except IntegrityError as e:
+                await db.rollback()
+
+                error_str = str(e)
+
+                if "ix_urls_long_url_hash" in error_str:
+                    # Find existing URL and return it via exception
+                    existing_url = (await db.execute(select(URL).where(URL.long_url_hash == digest))).scalars().first()
+                    await CacheService.index_long_url_async(digest, existing_url)
+                    raise URLAlreadyExistsError(existing_url)
+
+                elif "ix_urls_short_code" in error_str:
+                    if not generated:
+                        raise ShortCodeAlreadyExistsError("Custom alias already exists")
+                    # A custom alias already holds the generated code; allocate another one
+                    short_code = await URLService._generate_unique_short_code(db, original_url)
+                    continue
+
+                # Re-raise for other integrity errors
+                raise
+
+        raise NoFreeShortCodeError("Could not allocate a free short code")
+
+    @staticmethod
+    async def bulk_create_short_urls(db: AsyncSession, items):
+        """Create many short URLs with chunked multi-row inserts
+
+        `items` carry original_url, custom_alias and expires_in_days (URLCreate). Returns one
+        (status, url) pair per item in input order; see BULK_* statuses. Repeated long URLs in
+        the request are inserted once and reported as duplicates of the first occurrence.
+        Created and already existing links are added to the long URL index.
+        """
+        results = [None] * len(items)
+        first_index = {}
+        duplicates = []
+
+        unique = []
+        for index, item in enumerate(items):
+            digest = long_url_digest(item.original_url)
+            if digest in first_index:
+                duplicates.append((index, item, digest))
+            else:
+                first_index[digest] = index
+                unique.append((index, item, digest))
+
+        claimed_aliases = set()
+        for start in range(0, len(unique), URLService.BULK_CHUNK_SIZE):
+            chunk = unique[start:start + URLService.BULK_CHUNK_SIZE]
+            await URLService._bulk_create_chunk(db, chunk, results, claimed_aliases)
+
+        for index, item, digest in duplicates:
+            status, url = results[first_index[digest]]
+            if status in (BULK_CREATED, BULK_EXISTING, BULK_URL_EXISTS):
+                results[index] = (BULK_URL_EXISTS if item.custom_alias else BULK_EXISTING, url)
+            else:
+                results[index] = (BULK_DUPLICATE, None)
+
+        return results
+
+    @staticmethod
+    async def _bulk_create_chunk(db: AsyncSession, chunk, results, claimed_aliases):
+        from app.models.url import URL
+        from app.services.cache_service import CacheService
+
+        url_columns = (URL.long_url_hash, URL.long_url, URL.short_code, URL.expires_at)
+
+        # Resolve existing long URLs (by digest) and taken aliases with one IN query each
+        existing = {
+            row.long_url_hash: row
+            for row in await db.execute(select(*url_columns).where(URL.long_url_hash.in_([digest for _, _, digest in chunk])))
+        }
+        aliases = [item.custom_alias for _, item, _ in chunk if item.custom_alias]
+        taken = set((await db.execute(select(URL.short_code).where(URL.short_code.in_(aliases)))).scalars()) if aliases else set()
+
+        pending = []
+        for index, item, digest in chunk:
+            if digest in existing:
+                status = BULK_URL_EXISTS if item.custom_alias else BULK_EXISTING
+                results[index] = (status, existing[digest])
+            elif item.custom_alias and (item.custom_alias in taken or item.custom_alias in claimed_aliases):
+                results[index] = (BULK_ALIAS_CONFLICT, None)
+            else:
+                if item.custom_alias:
+                    claimed_aliases.add(item.custom_alias)
+                pending.append((index, item, digest))
+
+        now = utcnow()
+        created_codes = []
+        indexed = [(digest, existing[digest]) for _, _, digest in chunk if digest in existing]
+        for _ in range(URLService.MAX_INSERT_ATTEMPTS):
+            if not pending:
+                break
+
+            generated = iter(await URLService._generate_short_codes(
+                db, [item.original_url for _, item, _ in pending if not item.custom_alias]
+            ))
+            rows = []
+            for index, item, digest in pending:
+                rows.append({
+                    "id": uuid4(),
+                    "long_url": item.original_url,
+                    "long_url_hash": digest,
+                    "short_code": item.custom_alias or next(generated),
+                    "expires_at": now + timedelta(days=item.expires_in_days),
+                })
+
+            # No conflict target: rows clashing on long_url_hash or short_code are skipped instead of aborting the chunk
+            stmt = dialect_insert(db, URL).values(rows).on_conflict_do_nothing().returning(*url_columns)
+            inserted = {row.long_url_hash: row for row in await db.execute(stmt)}
+            await db.commit()
+
+            skipped = []
+            for index, item, digest in pending:
+                if digest in inserted:
+                    results[index] = (BULK_CREATED, inserted[digest])
+                    created_codes.append(inserted[digest].short_code)
+                    indexed.append((digest, inserted[digest]))
+                else:
+                    skipped.append((index, item, digest))
+
+            # Skipped rows lost a race on the long URL, or on short_code against a concurrent alias
+            raced = {}
+            if skipped:
+                raced = {
+                    row.long_url_hash: row
+                    for row in await db.execute(select(*url_columns).where(URL.long_url_hash.in_([digest for _, _, digest in skipped])))
+                }
+
+            pending = []
+            for index, item, digest in skipped:
+                if digest in raced:
+                    status = BULK_URL_EXISTS if item.custom_alias else BULK_EXISTING
+                    results[index] = (status, raced[digest])
+                    indexed.append((digest, raced[digest]))
+                elif item.custom_alias:
+                    results[index] = (BULK_ALIAS_CONFLICT, None)
+                else:
+                    # Generated code collided with a custom alias: retry with a fresh code
+                    pending.append((index, item, digest))
+
+        for index, _, _ in pending:
+            results[index] = (BULK_NO_FREE_CODE, None)
+
+        await CacheService.invalidate_many_async(created_codes)
+        await CacheService.index_long_urls_async(indexed)
+
+    @staticmethod
+    async def _generate_unique_short_code(db: AsyncSession, original_url: str, max_attempts=5):
+        return (await URLService._generate_short_codes(db, [original_url], max_attempts))[0]
+
+    @staticmethod
+    async def _generate_short_codes(db: AsyncSession, original_urls, max_attempts=5) -> list[str]:
+        """One free short code per long URL, checking each round of candidates with one IN query"""
         from app.models.url import URL
-        
+
+        # Leased sequence IDs are unique by construction: no lookups needed
+        if settings.SHORT_CODE_ALLOCATOR == "sequence":
+            return [await code_allocator.next_code(db) for _ in original_urls]
+
+        codes = [None] * len(original_urls)
+        chosen = set()
+        remaining = list(range(len(original_urls)))
         for i in range(max_attempts):
-            code = generate_entropy_code(original_url + str(i)) if i > 0 else generate_entropy_code(original_url)
-            
-            # Batch check for better performance
-            existing = db.query(URL.short_code).filter(URL.short_code == code).first()
-            if not existing:
-                return code
-        
+            if not remaining:
+                break
+            candidates = {
+                index: generate_entropy_code(original_urls[index] + str(i)) if i > 0 else generate_entropy_code(original_urls[index])
+                for index in remaining
+            }
+            taken = set((await db.execute(
+                select(URL.short_code).where(URL.short_code.in_(set(candidates.values())))
+            )).scalars())
+
+            remaining = []
+            for index, code in candidates.items():
+                # Two URLs of the batch drawing the same code count as a collision too
+                if code in taken or code in chosen:
+                    remaining.append(index)
+                else:
+                    codes[index] = code
+                    chosen.add(code)
+
         # Fallback with timestamp
-        return generate_entropy_code(original_url + str(int(datetime.now().timestamp())), length=8)
-    
+        for index in remaining:
+            codes[index] = generate_entropy_code(original_urls[index] + str(int(datetime.now().timestamp())), length=8)
+        return codes
+
+    @staticmethod
+    async def get_urls_paginated(db: AsyncSession, page: int, limit: int, cursor: str = None):
+        """Newest-first page of URLs, by opaque keyset cursor or by page number
+
+        Returns (urls, total, next_cursor). Cursor pages seek on ix_urls_created_at_id, so
+        their cost does not grow with depth; page numbers still use OFFSET for compatibility.
+        The total is the planner's estimate rather than a COUNT(*) over the table, and only
+        the first page by number gets one (None otherwise).
+        """
+        from app.models.url import URL
+
+        query = select(URL).order_by(URL.created_at.desc(), URL.id.desc())
+
+        if cursor:
+            created_at, url_id = _decode_cursor(cursor)
+            query = query.where(tuple_(URL.created_at, URL.id) < tuple_(created_at, url_id))
+        else:
+            query = query.offset((page - 1) * limit)
+
+        # Fetch one extra row to learn whether a next page exists
+        urls = (await db.execute(query.limit(limit + 1))).scalars().all()
+        next_cursor = _encode_cursor(urls[limit - 1]) if len(urls) > limit else None
+
+        # Only count if needed: estimate_total falls back to COUNT(*) where there are no statistics
+        total = await URLService.estimate_total(db) if not cursor and page == 1 else None
+
+        return urls[:limit], total, next_cursor
+
     @staticmethod
-    def get_urls_paginated(db: Session, page: int, limit: int):
+    async def estimate_total(db: AsyncSession) -> int:
+        """Row count of `urls` from pg_class statistics, exact count only when none exist yet"""
         from app.models.url import URL
-        
-        offset = (page - 1) * limit
-        
-        # Optimized query with select only needed fields
-        urls = db.query(URL).order_by(URL.created_at.desc()).offset(offset).limit(limit).all()
-        
-        # Only count if needed (expensive operation)
-        total = db.query(URL).count() if page == 1 else None
-        
-        return urls, total
-    
-    @staticmethod
-    def delete_url(db: Session, short_code: str = None, long_url: str = None):
+
+        if db.bind.dialect.name == "postgresql":
+            estimate = await db.scalar(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+                {"table": URL.__tablename__}
+            )
+            # reltuples is -1 (or 0 on older servers) until the table is first vacuumed/analyzed
+            if estimate and estimate > 0:
+                return estimate
+
+        return (await db.execute(select(func.count()).select_from(URL))).scalar_one()
+
+    @staticmethod
+    async def delete_url(db: AsyncSession, short_code: str = None, long_url: str = None):
         from app.models.url import URL
+        from app.models.url_click import URLClick
         from app.services.cache_service import CacheService
-        
-        query = db.query(URL)
-        
+        from app.services.edge_purger import purge_links
+
+        query = select(URL)
+
         if short_code:
-            query = query.filter(URL.short_code == short_code)
+            query = query.where(URL.short_code == short_code)
         elif long_url:
-            query = query.filter(URL.long_url == long_url)
-        
-        url = query.first()
-        
+            query = query.where(URL.long_url_hash == long_url_digest(long_url))
+
+        url = (await db.execute(query)).scalars().first()
+
         if url:
-            CacheService.invalidate_cache(url.short_code)
-            db.delete(url)
-            db.commit()
+            short_code, long_url_hash = url.short_code, url.long_url_hash
+            # Evicted before the commit so redirects stop at once, and again after it: a redirect
+            # loading the row in between would otherwise cache it for another CACHE_TTL
+            await CacheService.invalidate_cache_async(short_code)
+            # Link first: a click flush holding it share-locked commits before the clicks are deleted
+            await db.delete(url)
+            await db.flush()
+            await db.execute(delete(URLClick).where(URLClick.short_code == short_code))
+            await db.commit()
+            await CacheService.invalidate_cache_async(short_code)
+            # After the commit, so a create racing the delete cannot index the row again from the database
+            await CacheService.unindex_long_urls_async([long_url_hash])
+            await purge_links([short_code])
             return True
-        
+
         return False
-    
+
+    @staticmethod
+    async def get_click_stats(db: AsyncSession, short_code: str):
+        """Flushed click count and last access for a short code, None if the code does not exist
+
+        Counts are written behind by ClickTracker, so they lag by up to CLICK_FLUSH_INTERVAL.
+        """
+        from app.models.url import URL
+        from app.models.url_click import URLClick
+
+        return (await db.execute(
+            select(URL.short_code, func.coalesce(URLClick.clicks, 0).label("clicks"), URLClick.last_accessed_at)
+            .outerjoin(URLClick, URLClick.short_code == URL.short_code)
+            .where(URL.short_code == short_code)
+        )).first()
+
     @staticmethod
     def get_url_by_short_code(db: Session, short_code: str):
+        """Blocking lookup, kept for the sync redirect path (USE_ASYNC_REDIRECT=False)"""
         from app.services.cache_service import CacheService
         from app.models.url import URL
-        
+
         # Try cache first
         cached_data = CacheService.get_url_from_cache(short_code)
+        if cached_data is CacheService.NOT_FOUND:
+            return None
         if cached_data:
-            class CachedURL:
-                def __init__(self, data):
-                    self.long_url = data['long_url']
-                    self.short_code = data['short_code']
-                    self.expires_at = data.get('expires_at')
-            return CachedURL(cached_data)
-        
+            return URLResult(cached_data['long_url'], cached_data['short_code'], cached_data.get('expires_at'))
+
         # Optimized query - select only needed fields
-        url = db.query(URL.long_url, URL.short_code, URL.expires_at).filter(URL.short_code == short_code).first()
+        with phase("db"):
+            url = db.query(URL.long_url, URL.short_code, URL.expires_at).filter(URL.short_code == short_code).first()
         if not url:
+            cache_lookups.inc("db", "miss")
             return None
-        
+
         # Check expiration
-        if url.expires_at and datetime.now(timezone.utc) > url.expires_at.replace(tzinfo=timezone.utc):
+        if is_expired(url.expires_at):
+            cache_lookups.inc("db", "miss")
             return None
-        
-        # Create URL-like object
-        class URLResult:
-            def __init__(self, long_url, short_code, expires_at):
-                self.long_url = long_url
-                self.short_code = short_code
-                self.expires_at = expires_at
-        
+
+        cache_lookups.inc("db", "hit")
+
         result = URLResult(url.long_url, url.short_code, url.expires_at)
         CacheService.cache_url(short_code, result)
-        return result
\ No newline at end of file
+        return result
+
+    @staticmethod
+    async def get_url_by_short_code_async(db: AsyncSession, short_code: str, redis_missed: bool = False):
+        """Resolve a short code through L1 negatives, Redis and the database
+
+        redis_missed=True skips Redis, for a request whose fast path just found no entry there.
+        """
+        from app.services.local_cache import missing_codes, short_code_filter
+
+        # Known-absent codes never reach Redis or the database
+        if short_code in missing_codes:
+            cache_lookups.inc("l1_negative", "hit")
+            return None
+        if not short_code_filter.might_exist(short_code):
+            cache_lookups.inc("bloom", "hit")
+            return None
+
+        # Concurrent misses for one code in this worker share a single Redis/database lookup
+        return await url_lookups.do(short_code, lambda: URLService._lookup_async(db, short_code, redis_missed))
+
+    @staticmethod
+    async def get_cached_url_async(short_code: str):
+        """Redis-only lookup for the redirect fast path: URLResult on a hit, CacheService.MISS
+        when Redis holds no entry, None otherwise
+
+        Misses are left for get_url_by_short_code_async to resolve (with redis_missed=True);
+        a negative entry is copied into L1 so that lookup answers it without another round trip.
+        """
+        from app.services.cache_service import CacheService
+        from app.services.local_cache import missing_codes, short_code_filter
+
+        if short_code in missing_codes or not short_code_filter.might_exist(short_code):
+            return None
+        cached_data = await CacheService.get_url_from_cache_async(short_code, miss=CacheService.MISS)
+        if cached_data is CacheService.MISS:
+            return cached_data
+        if not cached_data:
+            return None
+        return URLService._cached_result(short_code, cached_data)
+
+    @staticmethod
+    def _cached_result(short_code: str, cached_data):
+        """URLResult for a Redis entry (None for a negative one), refreshing it early when due"""
+        from app.services.cache_service import CacheService
+        from app.services.local_cache import missing_codes
+
+        if cached_data is CacheService.NOT_FOUND:
+            missing_codes[short_code] = True
+            return None
+        if CacheService.should_refresh_early(cached_data) and not url_refreshes.in_flight(short_code):
+            URLService._spawn_refresh(short_code)
+        return URLResult(cached_data['long_url'], cached_data['short_code'], cached_data.get('expires_at'))
+
+    @staticmethod
+    async def _lookup_async(db: AsyncSession, short_code: str, redis_missed: bool = False):
+        from app.services.cache_service import CacheService
+
+        # Try cache first, unless this request already had a Redis miss on the fast path
+        cached_data = None if redis_missed else await CacheService.get_url_from_cache_async(short_code)
+        if not cached_data and settings.CACHE_FILL_LOCK_MS > 0 and not await CacheService.acquire_fill_lock_async(short_code):
+            # Another worker is loading this code: give it the lock period to fill Redis
+            cached_data = await CacheService.wait_for_fill_async(short_code)
+        if cached_data:
+            return URLService._cached_result(short_code, cached_data)
+
+        return await URLService._load_async(db, short_code)
+
+    @staticmethod
+    async def _load_async(db: AsyncSession, short_code: str):
+        """Database lookup that refills both cache tiers, with the miss cached too"""
+        from app.services.cache_service import CacheService
+        from app.services.local_cache import missing_codes
+        from app.models.url import URL
+
+        # Optimized query - select only needed fields
+        with phase("db"):
+            url = (await db.execute(
+                select(URL.long_url, URL.short_code, URL.expires_at).where(URL.short_code == short_code)
+            )).first()
+
+        # Missing or expired: cache the miss in both tiers
+        if not url or is_expired(url.expires_at):
+            cache_lookups.inc("db", "miss")
+            missing_codes[short_code] = True
+            await CacheService.cache_miss_async(short_code)
+            return None
+
+        cache_lookups.inc("db", "hit")
+
+        result = URLResult(url.long_url, url.short_code, url.expires_at)
+        await CacheService.cache_url_async(short_code, result)
+        return result
+
+    @staticmethod
+    def _spawn_refresh(short_code: str):
+        """Reload a hot Redis entry in the background while the current value keeps being served"""
+        from app.database.replicas import replica_router
+
+        async def refresh():
+            async with replica_router.async_sessionmaker_for(short_code)() as db:
+                await URLService._load_async(db, short_code)
+
+        async def refresh_once():
+            try:
+                await url_refreshes.do(short_code, refresh)
+            except Exception:
+                pass  # The entry is still valid; a later read tries again
+
+        task = asyncio.create_task(refresh_once())
+        _background_refreshes.add(task)
+        task.add_done_callback(_background_refreshes.discard)
@@ -0,0 +1,270 @@
+import threading
+import time
+from array import array
+
+# bytes.translate table halving every counter of a FrequencySketch row
+_HALVE = bytes(value >> 1 for value in range(256))
+
+# Sentinel slots heading the three circular LRU lists
+WINDOW, PROBATION, PROTECTED = 0, 1, 2
+
+
+class FrequencySketch:
+    """Count-Min sketch of recent access counts, saturating at 15, halved every 10 * width additions
+
+    The halving ages old popularity out, so the sketch tracks what is hot now.
+    """
+
+    def __init__(self, width: int):
+        self.width = 1 << max(4, (width - 1).bit_length())
+        self.mask = self.width - 1
+        self.rows = [bytearray(self.width) for _ in range(4)]
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def increment(self, key: str):
+        h = hash(key)
+        mask = self.mask
+        # Four row indexes from disjoint slices of one hash
+        for row, index in ((self.rows[0], h & mask), (self.rows[1], (h >> 16) & mask),
+                           (self.rows[2], (h >> 32) & mask), (self.rows[3], (h >> 48) & mask)):
+            if row[index] < 15:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [row.translate(_HALVE) for row in self.rows]
+            self.additions //= 2
+
+    def frequency(self, key: str) -> int:
+        h = hash(key)
+        mask = self.mask
+        rows = self.rows
+        return min(rows[0][h & mask], rows[1][(h >> 16) & mask], rows[2][(h >> 32) & mask], rows[3][(h >> 48) & mask])
+
+
+class CompactURLCache:
+    """Byte-budgeted string cache with W-TinyLFU admission, for the L1 URL cache
+
+    Values are stored UTF-8 encoded in one bytearray; per-entry state lives in parallel
+    arrays indexed by slot number (offset, length, deadlines, LRU links), so an entry costs
+    a dict slot and its key on top of its bytes, not a tuple plus a str. max_bytes bounds
+    values (plus buffer slack), keys and ENTRY_OVERHEAD per entry together, after the
+    frequency sketch's fixed share.
+
+    Eviction follows W-TinyLFU: new entries enter a small LRU window; entries leaving the
+    window join the main segmented LRU only if the frequency sketch rates them above the
+    main victim, so one-off lookups cannot flush out the hot set. Main is split into
+    probation and protected (hit at least twice) segments.
+
+    Drop-in for the TLRUCache it replaces: `cache[key] = (value, deadline)` stores until
+    min(now + ttl, deadline) and `get` returns (value, deadline) as stored. Freed bytes are reclaimed
+    by compacting the buffer when its tail is reached: live values are copied into a new
+    buffer a quarter larger than them, so each compaction is paid for by the inserts that
+    filled the slack, and every value is charged for its share of that slack.
+
+    Even a hit relinks entries, so the mapping methods hold a lock: the sync redirect
+    (USE_ASYNC_REDIRECT=False) reads and fills L1 from threadpool threads.
+    """
+
+    # Bytes charged per entry besides its value and key characters: the slot arrays and keys
+    # list (~61), the slot number's int object (32), the key str header (49) and the dict slot,
+    # up to ~88 right after the dict resizes
+    ENTRY_OVERHEAD = 230
+
+    INITIAL_BUFFER = 1 << 20
+
+    def __init__(self, max_bytes: int, ttl: float, timer=time.monotonic, window_fraction: float = 0.01, protected_fraction: float = 0.8):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timer = timer
+        self.sketch = FrequencySketch(max_bytes // 256)
+        entry_bytes = max(1, max_bytes - sum(len(row) for row in self.sketch.rows))
+        self.window_max = max(1, int(entry_bytes * window_fraction))
+        self.main_max = entry_bytes - self.window_max
+        self.protected_max = int(self.main_max * protected_fraction)
+        # A quarter of the budget at most, so a small cache starts within it
+        self.initial_buffer = min(max_bytes // 4, self.INITIAL_BUFFER)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.buffer = bytearray(self.initial_buffer)
+        self.tail = 0
+        self.index: dict[str, int] = {}
+        self.keys: list[str | None] = [None, None, None]
+        self.offset = array('q', [0, 0, 0])
+        self.length = array('l', [0, 0, 0])
+        # Eviction deadline (capped at ttl), and the deadline the entry was stored with
+        self.deadline = array('d', [0.0, 0.0, 0.0])
+        self.expires = array('d', [0.0, 0.0, 0.0])
+        self.segment = array('b', [WINDOW, PROBATION, PROTECTED])
+        self.prev = array('l', [WINDOW, PROBATION, PROTECTED])
+        self.next = array('l', [WINDOW, PROBATION, PROTECTED])
+        self.free_slots: list[int] = []
+        self.segment_bytes = [0, 0, 0]
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(self.segment_bytes)
+
+    # Linked lists
+
+    def _unlink(self, slot: int):
+        prev, next_ = self.prev[slot], self.next[slot]
+        self.next[prev] = next_
+        self.prev[next_] = prev
+
+    def _push_front(self, segment: int, slot: int):
+        first = self.next[segment]
+        self.prev[slot], self.next[slot] = segment, first
+        self.prev[first] = slot
+        self.next[segment] = slot
+        self.segment[slot] = segment
+
+    def _cost(self, slot: int) -> int:
+        return self.length[slot] * 5 // 4 + len(self.keys[slot]) + self.ENTRY_OVERHEAD
+
+    # Storage
+
+    def _value(self, slot: int) -> str:
+        start = self.offset[slot]
+        return self.buffer[start:start + self.length[slot]].decode('utf-8')
+
+    def _compact(self, capacity: int):
+        buffer = bytearray(capacity)
+        position = 0
+        for slot in self.index.values():
+            start, size = self.offset[slot], self.length[slot]
+            buffer[position:position + size] = self.buffer[start:start + size]
+            self.offset[slot] = position
+            position += size
+        self.buffer, self.tail = buffer, position
+
+    def _make_room(self, size: int):
+        live = sum(self.length[slot] for slot in self.index.values())
+        self._compact(max(self.initial_buffer, (live + size) * 5 // 4))
+
+    def _allocate(self, key: str, data: bytes, deadline: float, expires: float) -> int:
+        size = len(data)
+        if self.tail + size > len(self.buffer):
+            self._make_room(size)
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.keys[slot] = key
+            self.offset[slot], self.length[slot], self.deadline[slot] = self.tail, size, deadline
+            self.expires[slot] = expires
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            self.offset.append(self.tail)
+            self.length.append(size)
+            self.deadline.append(deadline)
+            self.expires.append(expires)
+            self.segment.append(WINDOW)
+            self.prev.append(WINDOW)
+            self.next.append(WINDOW)
+
+        self.buffer[self.tail:self.tail + size] = data
+        self.tail += size
+        self.index[key] = slot
+        return slot
+
+    def _remove(self, slot: int):
+        self._unlink(slot)
+        self.segment_bytes[self.segment[slot]] -= self._cost(slot)
+        del self.index[self.keys[slot]]
+        self.keys[slot] = None
+        self.free_slots.append(slot)
+
+    # Policy
+
+    def _on_hit(self, slot: int):
+        segment = self.segment[slot]
+        self._unlink(slot)
+        if segment != PROBATION:
+            self._push_front(segment, slot)
+            return
+
+        cost = self._cost(slot)
+        self.segment_bytes[PROBATION] -= cost
+        self.segment_bytes[PROTECTED] += cost
+        self._push_front(PROTECTED, slot)
+        while self.segment_bytes[PROTECTED] > self.protected_max:
+            demoted = self.prev[PROTECTED]
+            self._unlink(demoted)
+            cost = self._cost(demoted)
+            self.segment_bytes[PROTECTED] -= cost
+            self.segment_bytes[PROBATION] += cost
+            self._push_front(PROBATION, demoted)
+
+    def _admit(self, candidate: int):
+        """Move a window evictee into probation if it beats the main segment's victims"""
+        cost = self._cost(candidate)
+        frequency = None
+        while self.segment_bytes[PROBATION] + self.segment_bytes[PROTECTED] + cost > self.main_max:
+            victim = self.prev[PROBATION]
+            if victim == PROBATION:
+                victim = self.prev[PROTECTED]
+            if frequency is None:
+                frequency = self.sketch.frequency(self.keys[candidate])
+            if victim == PROTECTED or self.sketch.frequency(self.keys[victim]) >= frequency:
+                self._remove(candidate)
+                return
+            self._remove(victim)
+
+        self._unlink(candidate)
+        self.segment_bytes[WINDOW] -= cost
+        self.segment_bytes[PROBATION] += cost
+        self._push_front(PROBATION, candidate)
+
+    # Mapping interface used by the L1 cache helpers
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            self.sketch.increment(key)
+            slot = self.index.get(key)
+            if slot is None:
+                return default
+            if self.deadline[slot] <= self.timer():
+                self._remove(slot)
+                return default
+            self._on_hit(slot)
+            return self._value(slot), self.expires[slot]
+
+    def __setitem__(self, key: str, entry: tuple[str, float]):
+        value, expires = entry
+        data = value.encode('utf-8')
+        with self._lock:
+            deadline = min(self.timer() + self.ttl, expires)
+            slot = self.index.get(key)
+            if slot is not None:
+                self._remove(slot)
+
+            if len(data) * 5 // 4 + len(key) + self.ENTRY_OVERHEAD > self.main_max:
+                return
+
+            slot = self._allocate(key, data, deadline, expires)
+            self._push_front(WINDOW, slot)
+            self.segment_bytes[WINDOW] += self._cost(slot)
+            while self.segment_bytes[WINDOW] > self.window_max:
+                self._admit(self.prev[WINDOW])
+
+    def pop(self, key: str, default=None):
+        with self._lock:
+            slot = self.index.get(key)
+            if slot is None:
+                return default
+            entry = self._value(slot), self.expires[slot]
+            self._remove(slot)
+            return entry
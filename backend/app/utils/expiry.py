@@ -0,0 +1,27 @@
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    # `urls` uses naive timestamp columns holding UTC; asyncpg rejects aware datetimes for them
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def as_naive_utc(expires_at) -> datetime:
+    # Cached entries carry expires_at as str(datetime)
+    if isinstance(expires_at, str):
+        expires_at = datetime.fromisoformat(expires_at)
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc)
+    return expires_at.replace(tzinfo=None)
+
+
+def seconds_until(expires_at) -> float | None:
+    """Seconds left before expires_at (datetime or ISO string), None if it never expires"""
+    if not expires_at:
+        return None
+    return (as_naive_utc(expires_at) - utcnow()).total_seconds()
+
+
+def is_expired(expires_at) -> bool:
+    remaining = seconds_until(expires_at)
+    return remaining is not None and remaining <= 0
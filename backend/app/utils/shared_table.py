@@ -0,0 +1,220 @@
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+# File header: magic, layout version, slot count, slot size, generation (bumped by clear)
+_HEADER = struct.Struct("<8sIIII")
+_MAGIC = b"URLSHM\x00\x01"
+_LAYOUT_VERSION = 1
+_GENERATION_OFFSET = 20
+_GENERATION = struct.Struct("<I")
+_TAGS_OFFSET = 64
+
+# Slot header: sequence, checksum, generation, eviction deadline, link expiry, key and value lengths.
+# The checksum covers everything after it up to the end of the value.
+_SLOT = struct.Struct("<QIIddHH")
+_SEQUENCE = struct.Struct("<Q")
+_CHECKED_FROM = 12
+
+
+class SharedURLTable:
+    """Fixed-slot hash table in a memory-mapped file, shared as L1 by every worker on a host
+
+    Each short code hashes (crc32, the same in every process) to a window of PROBE slots;
+    a lookup checks the window's tags, one uint32 per slot packed ahead of the slots, and
+    reads only the slots whose tag matches. Inserts take a byte-range lock on the window,
+    then reuse the slot holding the code, else an empty or expired one, else the one due
+    to expire first. Entries whose key and value do not fit a slot are not stored.
+
+    Reads are lock-free, seqlock style: writers make a slot's sequence odd, write it, and
+    make the sequence even again; a reader that sees an odd sequence, or a different one
+    after copying, treats the slot as a miss rather than retrying. Each slot also carries
+    a crc32 of its contents, so a torn read is rejected even where the CPU reorders the
+    sequence loads. A writer that died mid-write leaves an odd sequence, which the next
+    writer of that slot repairs. clear() bumps the table generation, dropping every entry
+    at once. Deadlines are time.monotonic values, which every process on a host shares.
+
+    Same mapping interface as CompactURLCache: `table[key] = (value, deadline)` stores
+    until min(now + ttl, deadline) and `get` returns (value, deadline) as stored.
+    """
+
+    PROBE = 8
+
+    def __init__(self, path: str, slots: int, slot_size: int, ttl: float, timer=time.monotonic):
+        if slot_size <= _SLOT.size:
+            raise ValueError(f"Shared L1 slots must be larger than {_SLOT.size} bytes")
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.capacity = slot_size - _SLOT.size
+        self.ttl = ttl
+        self.timer = timer
+        self._tags = struct.Struct(f"<{self.PROBE}I")
+        # Slots PROBE - 1 past `slots` let the last windows run on without wrapping
+        self._table_slots = slots + self.PROBE - 1
+        self._slots_offset = _TAGS_OFFSET + -(-self._table_slots * 4 // 64) * 64
+        self.size = self._slots_offset + self._table_slots * slot_size
+        # Byte-range locks exclude other processes only; this excludes this process's threads
+        self._write_lock = threading.Lock()
+        self._fd = self._open()
+        self._map = mmap.mmap(self._fd, self.size)
+        self._view = memoryview(self._map)
+
+    def _open(self) -> int:
+        """Open the table file, creating it if missing or laid out for other settings"""
+        header = _HEADER.pack(_MAGIC, _LAYOUT_VERSION, self.slots, self.slot_size, 0)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # Another worker may have replaced the file between our open and lock
+                if os.fstat(fd).st_ino != os.stat(self.path).st_ino:
+                    os.close(fd)
+                    continue
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, header, 0)
+                    return fd
+                if os.pread(fd, _GENERATION_OFFSET, 0) == header[:_GENERATION_OFFSET]:
+                    return fd
+                # Left by a deploy with another layout: workers still mapping it keep their copy
+                os.unlink(self.path)
+                os.close(fd)
+            except FileNotFoundError:
+                os.close(fd)
+            finally:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                except OSError:
+                    pass
+
+    def close(self):
+        self._view.release()
+        self._map.close()
+        os.close(self._fd)
+
+    # Layout
+
+    def _window(self, data: bytes) -> tuple[int, int]:
+        tag = zlib.crc32(data)
+        return tag, tag % self.slots
+
+    def _generation(self) -> int:
+        return _GENERATION.unpack_from(self._map, _GENERATION_OFFSET)[0]
+
+    def _read(self, slot: int, data: bytes, generation: int, now: float):
+        offset = self._slots_offset + slot * self.slot_size
+        sequence, checksum, slot_generation, deadline, expires, key_length, value_length = _SLOT.unpack_from(self._map, offset)
+        if (sequence & 1 or slot_generation != generation or deadline <= now
+                or key_length != len(data) or key_length + value_length > self.capacity):
+            return None
+        start = offset + _SLOT.size
+        view = self._view
+        if view[start:start + key_length] != data:
+            return None
+        end = start + key_length + value_length
+        if zlib.crc32(view[offset + _CHECKED_FROM:end]) != checksum:
+            return None
+        value = str(view[start + key_length:end], "utf-8")
+        if _SEQUENCE.unpack_from(self._map, offset)[0] != sequence:
+            return None
+        return value, expires
+
+    def _write(self, slot: int, tag: int, fields: bytes, body: bytes):
+        offset = self._slots_offset + slot * self.slot_size
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0]
+        # An odd sequence here was left by a writer that died mid-write
+        sequence += 0 if sequence & 1 else 1
+        _SEQUENCE.pack_into(self._map, offset, sequence)
+        struct.pack_into("<I", self._map, _TAGS_OFFSET + slot * 4, tag)
+        start = offset + _CHECKED_FROM
+        record = fields + body
+        self._map[start:start + len(record)] = record
+        struct.pack_into("<I", self._map, offset + 8, zlib.crc32(record))
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+
+    def _lock_window(self, first: int, operation: int):
+        fcntl.lockf(self._fd, operation, self.PROBE * 4, _TAGS_OFFSET + first * 4)
+
+    # Mapping interface used by the L1 cache helpers
+
+    def get(self, key: str, default=None):
+        data = key.encode("utf-8")
+        tag, first = self._window(data)
+        generation = self._generation()
+        now = self.timer()
+        for index, slot_tag in enumerate(self._tags.unpack_from(self._map, _TAGS_OFFSET + first * 4)):
+            if slot_tag == tag:
+                entry = self._read(first + index, data, generation, now)
+                if entry is not None:
+                    return entry
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, entry: tuple[str, float]):
+        value, expires = entry
+        data, encoded = key.encode("utf-8"), value.encode("utf-8")
+        if len(data) + len(encoded) > self.capacity:
+            return
+
+        now = self.timer()
+        deadline = min(now + self.ttl, expires)
+        tag, first = self._window(data)
+        with self._write_lock:
+            self._lock_window(first, fcntl.LOCK_EX)
+            try:
+                generation = self._generation()
+                chosen, chosen_deadline = first, None
+                for slot in range(first, first + self.PROBE):
+                    offset = self._slots_offset + slot * self.slot_size
+                    _, _, slot_generation, slot_deadline, _, key_length, _ = _SLOT.unpack_from(self._map, offset)
+                    start = offset + _SLOT.size
+                    if slot_generation != generation or slot_deadline <= now:
+                        slot_deadline = -1.0
+                    elif key_length == len(data) and self._view[start:start + key_length] == data:
+                        chosen = slot
+                        break
+                    if chosen_deadline is None or slot_deadline < chosen_deadline:
+                        chosen, chosen_deadline = slot, slot_deadline
+
+                fields = struct.pack("<IddHH", generation, deadline, expires, len(data), len(encoded))
+                self._write(chosen, tag, fields, data + encoded)
+            finally:
+                self._lock_window(first, fcntl.LOCK_UN)
+
+    def pop(self, key: str, default=None):
+        data = key.encode("utf-8")
+        tag, first = self._window(data)
+        found = default
+        with self._write_lock:
+            self._lock_window(first, fcntl.LOCK_EX)
+            try:
+                generation = self._generation()
+                for slot in range(first, first + self.PROBE):
+                    entry = self._read(slot, data, generation, -1.0)
+                    if entry is not None:
+                        found = entry
+                        # A zero deadline reads as expired everywhere, and frees the slot for inserts
+                        self._write(slot, 0, struct.pack("<IddHH", generation, 0.0, 0.0, 0, 0), b"")
+            finally:
+                self._lock_window(first, fcntl.LOCK_UN)
+        return found
+
+    def clear(self):
+        """Drop every entry, for every process mapping the table"""
+        # Unlocked: two racing clears may bump the generation once, which still drops everything
+        _GENERATION.pack_into(self._map, _GENERATION_OFFSET, (self._generation() + 1) & 0xFFFFFFFF)
+
+    def __len__(self) -> int:
+        generation, now = self._generation(), self.timer()
+        count = 0
+        for slot in range(self._table_slots):
+            _, _, slot_generation, deadline, _, _, _ = _SLOT.unpack_from(self._map, self._slots_offset + slot * self.slot_size)
+            count += slot_generation == generation and deadline > now
+        return count
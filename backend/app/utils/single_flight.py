@@ -0,0 +1,45 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one execution on this event loop
+
+    The first caller for a key runs `fn`; callers arriving while it is in flight await the
+    same result (or exception). If the running call is cancelled, waiters retry themselves.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn):
+        """Result of `await fn()`, shared with every concurrent call for `key`"""
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved: with no waiters asyncio would log it as never retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
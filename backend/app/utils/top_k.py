@@ -0,0 +1,37 @@
+from operator import itemgetter
+
+
+class TopK:
+    """Approximate heavy-hitter counter: Space-Saving with batched eviction
+
+    Tracks at most 2k keys. When full, the k largest counts are kept and `floor` rises to
+    the largest count dropped; keys seen afterwards start counting from the floor. Counts
+    overestimate by at most the floor, and any key seen more often than that is retained.
+    Adding a key is one dict update, amortised over the occasional sort.
+    """
+    
+    def __init__(self, k: int):
+        self.k = k
+        self.counts: dict[str, int] = {}
+        self.floor = 0
+    
+    def add(self, key: str):
+        count = self.counts.get(key)
+        if count is None:
+            if len(self.counts) >= 2 * self.k:
+                self._prune()
+            count = self.floor
+        self.counts[key] = count + 1
+    
+    def _prune(self):
+        ranked = sorted(self.counts.items(), key=itemgetter(1), reverse=True)
+        self.floor = ranked[self.k][1]
+        self.counts = dict(ranked[:self.k])
+    
+    def top(self, n: int | None = None) -> list[tuple[str, int]]:
+        """(key, count) pairs, most frequent first"""
+        return sorted(self.counts.items(), key=itemgetter(1), reverse=True)[:n or self.k]
+    
+    def clear(self):
+        self.counts = {}
+        self.floor = 0
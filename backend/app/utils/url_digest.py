@@ -0,0 +1,33 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+from app.core.config import settings
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for deduplication: lowercase scheme and host, no default port, no trailing slash"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    userinfo, _, hostport = parts.netloc.rpartition("@")
+    if hostport.startswith("["):
+        # IPv6 literal: the port, if any, follows the closing bracket
+        host, _, port = hostport.partition("]")
+        host += "]"
+        port = port[1:]
+    else:
+        host, _, port = hostport.partition(":")
+
+    if port == DEFAULT_PORTS.get(scheme):
+        port = ""
+    netloc = (f"{userinfo}@" if userinfo else "") + host.lower() + (f":{port}" if port else "")
+
+    return urlunsplit((scheme, netloc, parts.path.rstrip("/"), parts.query, parts.fragment))
+
+
+def long_url_digest(url: str) -> bytes:
+    """SHA-256 of the long URL (normalized when NORMALIZE_LONG_URLS is set), stored in urls.long_url_hash"""
+    if settings.NORMALIZE_LONG_URLS:
+        url = normalize_url(url)
+    return hashlib.sha256(url.encode('utf-8')).digest()
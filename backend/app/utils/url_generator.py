@@ -6,6 +6,14 @@ from datetime import datetime, timezone
 
 # Base62 characters (a-z, A-Z, 0-9) - excludes + and / for URL safety
 BASE62_CHARS = string.ascii_lowercase + string.ascii_uppercase + string.digits
+_BASE62_SET = frozenset(BASE62_CHARS)
+
+# Longest short code (generated or custom alias) the service will look up
+MAX_SHORT_CODE_LENGTH = 32
+
+def is_valid_short_code(short_code: str, max_length: int = MAX_SHORT_CODE_LENGTH) -> bool:
+    """Check a short code is non-empty, within length and only uses BASE62_CHARS"""
+    return 0 < len(short_code) <= max_length and _BASE62_SET.issuperset(short_code)
 
 def generate_short_code(length: int = 6) -> str:
     """Generate a random short code for URL shortening (fallback method)"""
@@ -40,6 +48,38 @@ def hex_to_base62(hex_string: str) -> str:
     
     return ''.join(reversed(result))
 
+def encode_base62(num: int, length: int) -> str:
+    """Encode a non-negative integer as fixed-width base62, left-padded with BASE62_CHARS[0]"""
+    result = []
+    while num > 0:
+        result.append(BASE62_CHARS[num % 62])
+        num //= 62
+    
+    if len(result) > length:
+        raise ValueError(f"{length} base62 characters cannot hold this value")
+    
+    return ''.join(reversed(result)).rjust(length, BASE62_CHARS[0])
+
+def permute_id(num: int, key: bytes, length: int, rounds: int = 4) -> int:
+    """Keyed bijection on [0, 62**length) so sequential IDs do not give guessable codes
+    
+    Balanced Feistel network over the smallest even bit width covering the domain,
+    cycle-walking until the result falls back inside it.
+    """
+    domain = 62 ** length
+    half_bits = (domain.bit_length() + 1) // 2
+    mask = (1 << half_bits) - 1
+    
+    while True:
+        left, right = num >> half_bits, num & mask
+        for round_no in range(rounds):
+            round_input = bytes([round_no]) + right.to_bytes(8, 'big')
+            f = int.from_bytes(hashlib.blake2b(round_input, key=key, digest_size=8).digest(), 'big') & mask
+            left, right = right, left ^ f
+        num = (left << half_bits) | right
+        if num < domain:
+            return num
+
 def generate_entropy_code(original_url: str, length: int = 6) -> str:
     """Generate short code with high entropy using URL + random nonce"""
     # Use cryptographically secure random nonce
@@ -0,0 +1,64 @@
+import orjson
+
+
+class ASGIClient:
+    """Minimal in-process ASGI driver: no sockets, no HTTP client, only the app under test"""
+
+    def __init__(self, app, client_ip: str = "127.0.0.1"):
+        self.app = app
+        self.client_ip = client_ip
+        self._lifespan_queue = None
+
+    async def request(self, method: str, path: str, query: str = "", json=None, headers: dict | None = None) -> tuple[int, dict, bytes]:
+        body = orjson.dumps(json) if json is not None else b""
+        extra_headers = headers or {}
+        headers = [(b"host", b"bench")] + [(key.lower().encode(), value.encode()) for key, value in extra_headers.items()]
+        if json is not None:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "root_path": "", "headers": headers,
+            "client": (self.client_ip, 50000), "server": ("bench", 80),
+        }
+        sent_body = False
+        response = {"status": 0, "headers": {}, "body": []}
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = {key.decode(): value.decode() for key, value in message.get("headers", [])}
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return response["status"], response["headers"], b"".join(response["body"])
+
+    async def startup(self):
+        import asyncio
+
+        self._lifespan_queue = asyncio.Queue()
+        started = asyncio.Event()
+
+        async def receive():
+            return await self._lifespan_queue.get()
+
+        async def send(message):
+            if message["type"] in ("lifespan.startup.complete", "lifespan.startup.failed"):
+                started.set()
+
+        self._lifespan_task = asyncio.create_task(self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+        await self._lifespan_queue.put({"type": "lifespan.startup"})
+        await started.wait()
+
+    async def shutdown(self):
+        await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+        await self._lifespan_task
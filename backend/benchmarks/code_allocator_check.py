@@ -0,0 +1,122 @@
+"""Check that leased short code blocks never overlap across concurrent workers
+
+    python -m benchmarks.code_allocator_check [--database-url postgresql://...] [--processes 8] [--codes 3000] [--block-size 1000]
+
+Starts --processes processes, each allocating --codes short codes from several concurrent
+tasks through its own ShortCodeAllocator, all leasing blocks from one Postgres sequence
+(a scratch sequence, created and dropped here, so url_code_seq is left alone). Every code
+handed out must be unique. It also checks that permute_id is a bijection, exhaustively on
+62**3 IDs. Exits 1 on a duplicate code or a permutation collision.
+
+Without --database-url it starts a throwaway PostgreSQL server with pgserver (in
+requirements-dev.txt), deleted when the check ends.
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import sys
+import tempfile
+
+CHECK_SEQUENCE = "code_allocator_check_seq"
+TASKS_PER_PROCESS = 4
+
+
+def allocate(database_url: str, block_size: int, codes: int, results):
+    from benchmarks import environment
+    environment.configure(database_url=database_url)
+
+    from sqlalchemy import Sequence
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app.database.database import to_async_url
+    from app.services.code_allocator import ShortCodeAllocator
+
+    async def run():
+        engine = create_async_engine(to_async_url(database_url))
+        sessions = async_sessionmaker(engine, class_=AsyncSession)
+        allocator = ShortCodeAllocator(Sequence(CHECK_SEQUENCE, increment=block_size), 7, hashlib.sha256(b"check").digest())
+
+        async def task(count: int) -> list[str]:
+            allocated = []
+            async with sessions() as db:
+                for _ in range(count):
+                    allocated.append(await allocator.next_code(db))
+            return allocated
+
+        per_task = codes // TASKS_PER_PROCESS
+        batches = await asyncio.gather(*[task(per_task) for _ in range(TASKS_PER_PROCESS)])
+        await engine.dispose()
+        return [code for batch in batches for code in batch]
+
+    results.put(asyncio.run(run()))
+
+
+def scratch_database_url() -> str:
+    import pgserver
+
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="code-allocator-check-"), cleanup_mode="delete")
+    return server.get_uri()
+
+
+def check_permutation() -> int:
+    from app.utils.url_generator import permute_id
+
+    key = hashlib.sha256(b"check").digest()
+    domain = 62 ** 3
+    images = {permute_id(value, key, 3) for value in range(domain)}
+    return domain - len(images) + sum(1 for image in images if not 0 <= image < domain)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="postgresql://... (sequences are Postgres-only); default: a throwaway pgserver")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--codes", type=int, default=3000, help="codes allocated per process")
+    parser.add_argument("--block-size", type=int, default=1000)
+    args = parser.parse_args()
+    if args.database_url is None:
+        args.database_url = scratch_database_url()
+    if not args.database_url.startswith("postgresql"):
+        parser.error("--database-url must be a PostgreSQL URL")
+
+    from benchmarks import environment
+    environment.configure(database_url=args.database_url)
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SEQUENCE IF EXISTS {CHECK_SEQUENCE}"))
+        conn.execute(text(f"CREATE SEQUENCE {CHECK_SEQUENCE} START 1 INCREMENT {args.block_size}"))
+
+    failed = False
+    try:
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [
+            context.Process(target=allocate, args=(args.database_url, args.block_size, args.codes, results))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        allocated = []
+        for _ in processes:
+            allocated.extend(results.get())
+        for process in processes:
+            process.join()
+            failed |= process.exitcode != 0
+
+        duplicates = len(allocated) - len(set(allocated))
+        print(f"{args.processes} processes x {TASKS_PER_PROCESS} tasks: {len(allocated)} codes, {duplicates} duplicates")
+        failed |= duplicates > 0
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SEQUENCE IF EXISTS {CHECK_SEQUENCE}"))
+        engine.dispose()
+
+    collisions = check_permutation()
+    print(f"permute_id over 62**3 IDs: {collisions} collisions")
+    sys.exit(1 if failed or collisions else 0)
+
+
+if __name__ == "__main__":
+    main()
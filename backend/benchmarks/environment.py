@@ -0,0 +1,62 @@
+"""Offline benchmark environment: settings defaults, SQLite schema support and in-process Redis
+
+`configure` must run before anything under `app` is imported, since settings, engines and
+Redis clients are created at import time. `install_redis` runs after the imports and swaps
+the app's Redis clients for fakeredis when no real server was given.
+"""
+import os
+import tempfile
+
+
+def configure(database_url: str | None = None, redis_url: str | None = None, **overrides):
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="url-shortener-bench-"), "bench.sqlite")
+        database_url = f"sqlite:///{path}"
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["REDIS_URL"] = redis_url or "redis://localhost:6379/0"
+    os.environ.setdefault("CORS_ORIGINS", "http://localhost:3000")
+    os.environ.setdefault("DEBUG", "false")
+    # Background sweeps would add noise unrelated to the measured request paths
+    os.environ.setdefault("EXPIRY_SWEEP_ENABLED", "false")
+    if database_url.startswith("sqlite"):
+        # SQLite has no sequences to lease short code blocks from
+        os.environ.setdefault("SHORT_CODE_ALLOCATOR", "random")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+
+    if database_url.startswith("sqlite"):
+        _render_uuid_on_sqlite()
+
+
+def _render_uuid_on_sqlite():
+    from sqlalchemy import UUID
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(UUID, "sqlite")
+    def _uuid_as_char(type_, compiler, **kw):
+        return "CHAR(32)"
+
+
+def install_redis(redis_url: str | None = None) -> str:
+    """Point the app at fakeredis unless a real server URL was given; returns a description"""
+    if redis_url:
+        return redis_url
+
+    import fakeredis
+    import fakeredis.aioredis
+    import app.database.redis as redis_module
+
+    server = fakeredis.FakeServer()
+    redis_module.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    redis_module.async_redis_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    return "fakeredis"
+
+
+def create_schema():
+    import app.models.url  # noqa: F401
+    import app.models.url_click  # noqa: F401
+    from app.database.database import Base, engine
+
+    Base.metadata.create_all(engine)
@@ -0,0 +1,65 @@
+"""Local stand-in for a CDN purge API, for exercising EDGE_PURGER=http without a CDN
+
+    python -m benchmarks.purge_stub [--port 9080]
+
+Then run the API with EDGE_PURGER=http and EDGE_PURGE_URL=http://127.0.0.1:9080/purge. Every
+POST is answered 200 and its Surrogate-Key header logged, as Fastly's purge endpoint takes
+it. In-process, PurgeStub().start() serves on a free port and collects keys in `purged`.
+"""
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PurgeStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, verbose: bool = False):
+        self.purged: list[str] = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                keys = self.headers.get("Surrogate-Key", "").split()
+                stub.purged.extend(keys)
+                if verbose:
+                    print(f"purge {self.path}: {' '.join(keys)}", flush=True)
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/purge"
+
+    def start(self) -> "PurgeStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9080)
+    args = parser.parse_args()
+
+    stub = PurgeStub(args.host, args.port, verbose=True)
+    print(f"Purge stub listening on {stub.url}", flush=True)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Check that creates are rate limited per link, through single and bulk requests alike
+
+    python -m benchmarks.rate_limit_check [--budget 100]
+
+Drives the app in process (SQLite, fakeredis) with the bulk limiter's budget set to
+--budget links: a bulk request within it must pass, one taking the client past it must
+get 429, and so must a bulk request larger than the whole budget. Exits 1 on a failure.
+"""
+import argparse
+import asyncio
+import sys
+
+from benchmarks import environment
+
+environment.configure()
+environment.install_redis()
+environment.create_schema()
+
+from benchmarks.asgi_client import ASGIClient
+
+
+async def bulk(client: ASGIClient, start: int, count: int) -> int:
+    items = [{"original_url": f"https://example.com/check/{start + index}"} for index in range(count)]
+    status, _, _ = await client.request("POST", "/api/v1/urls/bulk", json={"urls": items})
+    return status
+
+
+async def run(budget: int) -> list[str]:
+    from app.main import app
+    import app.middleware.rate_limit as rate_limit
+
+    rate_limit.bulk_create_limiter = rate_limit.build_limiter("local", "bulk_create", max_requests=budget, window_seconds=60)
+    failures = []
+    client = ASGIClient(app)
+    await client.startup()
+    try:
+        first = budget * 3 // 4
+        checks = [
+            (f"bulk of {first} within the budget", await bulk(client, 0, first), 200),
+            (f"bulk of {budget - first + 1} past the remaining budget", await bulk(client, first, budget - first + 1), 429),
+        ]
+        other = ASGIClient(app, client_ip="10.0.0.2")
+        checks.append((f"bulk of {budget + 1} from a fresh client", await bulk(other, budget * 2, budget + 1), 429))
+        checks.append((f"bulk of {budget} from that client", await bulk(other, budget * 3, budget), 200))
+    finally:
+        await client.shutdown()
+
+    for name, status, expected in checks:
+        print(f"{name}: {status}")
+        if status != expected:
+            failures.append(f"{name}: expected {expected}, got {status}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=100)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args.budget))
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
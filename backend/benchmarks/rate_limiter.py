@@ -0,0 +1,104 @@
+"""Compare rate limiter backends: per-call overhead through the middleware and retained memory
+
+    python -m benchmarks.rate_limiter [--requests 200000] [--clients 10000] [--redis-url redis://...]
+
+The "redis" backend runs against --redis-url, or in-process fakeredis when it is installed
+(fakeredis timings reflect its Lua emulation, not a real network round trip). A "redis"
+limiter that cannot run its script falls back to the local one; that row is then skipped
+rather than reported as Redis numbers (fakeredis without its lua extra does this).
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks import environment
+
+# Settings are required at import time; the benchmark never touches the database
+environment.configure()
+
+from starlette.requests import Request
+from starlette.responses import Response
+import app.middleware.rate_limit as rate_limit
+
+
+def make_request(path: str, client_ip: str) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [], "client": (client_ip, 12345), "server": ("bench", 80), "scheme": "http",
+    })
+
+
+async def call_next(request):
+    return Response(status_code=301)
+
+
+def fell_back(limiter) -> bool:
+    return getattr(limiter, "fallback_decisions", 0) > 0
+
+
+async def run_backend(backend: str, total: int, clients: int) -> dict | None:
+    """Timings and retained memory for one backend; None if a "redis" limiter fell back to local"""
+    # Limit large enough that the benchmark measures bookkeeping, not rejections
+    limiter = rate_limit.build_limiter(backend, "bench", max_requests=total, window_seconds=60)
+    await limiter.is_allowed("probe")
+    if fell_back(limiter):
+        return None
+    rate_limit.redirect_limiter = limiter
+    requests = [make_request("/abc1234", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}") for i in range(clients)]
+
+    start = time.perf_counter()
+    for i in range(total):
+        await rate_limit.rate_limit_middleware(requests[i % clients], call_next)
+    elapsed = time.perf_counter() - start
+
+    # Memory is measured on a second, traced limiter so tracing does not skew the timings
+    limiter = rate_limit.build_limiter(backend, "bench-memory", max_requests=total, window_seconds=60)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(total):
+        await limiter.is_allowed(requests[i % clients].client.host)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    if fell_back(rate_limit.redirect_limiter) or fell_back(limiter):
+        return None
+
+    return {
+        "backend": backend,
+        "us_per_request": round(elapsed / total * 1e6, 2),
+        "requests_per_sec": round(total / elapsed),
+        "retained_kib": round(retained / 1024, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    backends = ["memory", "local"]
+    if args.redis_url:
+        import app.database.redis as redis_module
+        redis_module.async_redis_client = redis_module.aioredis.from_url(args.redis_url, decode_responses=True)
+        backends.append("redis")
+    else:
+        try:
+            environment.install_redis()
+            backends.append("redis")
+        except ImportError:
+            print("redis backend skipped: pass --redis-url or install fakeredis")
+
+    print(f"{'backend':<8} {'us/request':>11} {'requests/s':>11} {'retained KiB':>13}")
+    for backend in backends:
+        total = args.requests if backend != "redis" else min(args.requests, 20_000)
+        result = await run_backend(backend, total, args.clients)
+        if result is None:
+            print(f"{backend} backend skipped: its Lua script could not run, so decisions came from the local fallback (pass --redis-url, or install fakeredis[lua])")
+            continue
+        print(f"{result['backend']:<8} {result['us_per_request']:>11} {result['requests_per_sec']:>11} {result['retained_kib']:>13}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,239 @@
+"""Offline benchmark of the redirect, create and list paths, driven in-process through ASGI
+
+    python -m benchmarks.run [--links 10000] [--requests 5000] [--concurrency 8] [--output results.json]
+                             [--database-url postgresql://...] [--redis-url redis://...] [--scenarios l1_hit,db_miss]
+                             [--no-fast-path]
+
+Defaults to a fresh SQLite file and fakeredis, so no network or services are needed. Against
+Postgres, run `alembic upgrade head` first. Redirect traffic follows a seeded Zipfian
+distribution over the seeded links; each scenario reports p50/p99 latency and requests/s,
+and the JSON output carries the git commit so runs can be compared across commits.
+--no-fast-path serves redirects through the FastAPI route only, to compare against RedirectFastPath.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import orjson
+
+from benchmarks import environment
+
+SCENARIOS = ("l1_hit", "redis_hit", "db_miss", "not_found", "create", "list_offset_deep", "list_cursor_deep")
+LIST_LIMIT = 50
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def seed_links(count: int) -> list[str]:
+    """Insert `count` links with deterministic codes (skipping ones already present) and return the codes"""
+    from sqlalchemy.orm import Session
+    from app.database.database import engine, dialect_insert
+    from app.models.url import URL
+    from app.utils.url_digest import long_url_digest
+
+    codes = [f"bench{i}" for i in range(count)]
+    base = datetime.now(timezone.utc).replace(tzinfo=None)
+    with Session(engine) as db:
+        for start in range(0, count, 1000):
+            rows = [
+                {
+                    "long_url": f"https://bench.example/{i}",
+                    "long_url_hash": long_url_digest(f"https://bench.example/{i}"),
+                    "short_code": codes[i],
+                    "expires_at": base + timedelta(days=30),
+                    # Distinct timestamps give list pages a stable (created_at, id) order
+                    "created_at": base - timedelta(milliseconds=i),
+                }
+                for i in range(start, min(start + 1000, count))
+            ]
+            db.execute(dialect_insert(db, URL).values(rows).on_conflict_do_nothing())
+        db.commit()
+    return codes
+
+
+def cursor_at_depth(depth: int) -> str:
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+    from app.database.database import engine
+    from app.models.url import URL
+    from app.services.url_service import _encode_cursor
+
+    with Session(engine) as db:
+        url = db.execute(
+            select(URL).order_by(URL.created_at.desc(), URL.id.desc()).offset(depth - 1).limit(1)
+        ).scalars().first()
+        return _encode_cursor(url)
+
+
+def build_scenario(name: str, codes: list[str], ranks: list[int], run_id: str):
+    """Requests for a scenario as (method, path, query, json, prepare) with prepare run untimed before each"""
+    from app.database.redis import get_async_redis
+    from app.services.local_cache import url_cache
+
+    async def evict_l1(code):
+        url_cache.pop(code, None)
+
+    async def evict_l1_and_redis(code):
+        url_cache.pop(code, None)
+        await get_async_redis().delete(f"url:{code}")
+
+    if name == "l1_hit":
+        return [("GET", f"/{codes[rank]}", "", None, None) for rank in ranks]
+    if name == "redis_hit":
+        return [("GET", f"/{codes[rank]}", "", None, evict_l1(codes[rank])) for rank in ranks]
+    if name == "db_miss":
+        return [("GET", f"/{codes[rank]}", "", None, evict_l1_and_redis(codes[rank])) for rank in ranks]
+    if name == "not_found":
+        return [("GET", f"/missing{run_id}x{i}", "", None, None) for i in range(len(ranks))]
+    if name == "create":
+        return [
+            ("POST", "/api/v1/urls/create", "", {"original_url": f"https://bench.example/new/{run_id}/{i}"}, None)
+            for i in range(len(ranks))
+        ]
+    if name == "list_offset_deep":
+        page = max(1, len(codes) // LIST_LIMIT - 1)
+        return [("GET", "/api/v1/urls/list", f"page={page}&limit={LIST_LIMIT}", None, None) for _ in ranks]
+    if name == "list_cursor_deep":
+        depth = max(1, (len(codes) // LIST_LIMIT - 2) * LIST_LIMIT)
+        cursor = cursor_at_depth(depth)
+        return [("GET", "/api/v1/urls/list", f"cursor={cursor}&limit={LIST_LIMIT}", None, None) for _ in ranks]
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def run_scenario(client, requests, concurrency: int) -> dict:
+    latencies = []
+    statuses = Counter()
+    queue = iter(requests)
+
+    async def worker():
+        for method, path, query, json, prepare in queue:
+            if prepare is not None:
+                await prepare
+            start = time.perf_counter()
+            status_code, _, _ = await client.request(method, path, query, json)
+            latencies.append(time.perf_counter() - start)
+            statuses[status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def main(args):
+    from app.main import app
+    import app.middleware.rate_limit as rate_limit
+    from app.services.local_cache import short_code_filter
+    from benchmarks.asgi_client import ASGIClient
+    from benchmarks.workload import ZipfianGenerator
+
+    # Per-request session logs (including 404s logged as errors) would dominate the output and timings
+    logging.disable(logging.ERROR)
+    # Measure the request paths, not 429s: one client IP sends everything
+    rate_limit.create_limiter = rate_limit.build_limiter("local", "bench-create", 10 ** 9, 60)
+    rate_limit.redirect_limiter = rate_limit.build_limiter("local", "bench-redirect", 10 ** 9, 60)
+
+    codes = seed_links(args.links)
+    client = ASGIClient(app)
+    await client.startup()
+
+    # The short code filter loads in the background; not_found depends on it
+    for _ in range(200):
+        if short_code_filter.ready:
+            break
+        await asyncio.sleep(0.05)
+
+    zipf = ZipfianGenerator(len(codes), s=args.zipf_s, seed=args.seed)
+    run_id = str(int(time.time()))
+
+    # Warm Redis and L1 for every code the workload will touch
+    for rank in sorted(set(zipf.sample(args.requests))):
+        await client.request("GET", f"/{codes[rank]}")
+
+    results = {}
+    for name in args.scenarios:
+        ranks = ZipfianGenerator(len(codes), s=args.zipf_s, seed=args.seed).sample(args.requests)
+        warmup = build_scenario(name, codes, ranks[:args.warmup], run_id + "w")
+        await run_scenario(client, warmup, args.concurrency)
+        results[name] = await run_scenario(client, build_scenario(name, codes, ranks, run_id), args.concurrency)
+        result = results[name]
+        print(f"{name:<18} p50 {result['p50_ms']:>8.3f} ms  p99 {result['p99_ms']:>8.3f} ms  "
+              f"{result['requests_per_sec']:>9.1f} req/s  {result['statuses']}")
+
+    await client.shutdown()
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=10_000, help="links seeded before the run")
+    parser.add_argument("--requests", type=int, default=5_000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="Zipf exponent of redirect popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--redis-url", default=None, help="defaults to in-process fakeredis")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--no-fast-path", action="store_true", help="disable the raw ASGI redirect fast path")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    environment.configure(args.database_url, args.redis_url, REDIRECT_FAST_PATH=not args.no_fast_path)
+    redis_description = environment.install_redis(args.redis_url)
+    environment.create_schema()
+
+    results = asyncio.run(main(args))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": os.environ["DATABASE_URL"].split("://")[0],
+            "redis": redis_description if redis_description == "fakeredis" else "redis",
+            "links": args.links,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "zipf_s": args.zipf_s,
+            "seed": args.seed,
+            "redirect_fast_path": not args.no_fast_path,
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "wb") as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    print(f"Results written to {args.output}")
@@ -0,0 +1,113 @@
+"""Multi-process stress test of the shared L1 table: readers must never see a torn entry
+
+    python -m benchmarks.shared_l1_stress [--writers 4] [--readers 4] [--seconds 10] [--keys 256] [--slots 128]
+
+Writers keep rewriting a small set of keys (more keys than slots, so windows also evict),
+occasionally popping one or clearing the table. Each value is derived from its key and a
+version number, with a version-dependent length and fill byte, so a value mixing two
+writes, or belonging to another key, is detected by the readers. Exits 1 on any torn read.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.utils.shared_table import SharedURLTable
+
+SLOT_BYTES = 256
+
+
+def make_value(key: str, version: int) -> str:
+    fill = "abcdefghijklmnopqrstuvwxyz"[version % 26]
+    return f"https://example.com/{key}/{version}/" + fill * (version % 150)
+
+
+def is_consistent(key: str, value: str) -> bool:
+    prefix = f"https://example.com/{key}/"
+    if not value.startswith(prefix):
+        return False
+    version, _, padding = value[len(prefix):].partition("/")
+    return version.isdigit() and value == make_value(key, int(version))
+
+
+def writer(path: str, slots: int, keys: int, deadline: float, seed: int):
+    table = SharedURLTable(path, slots, SLOT_BYTES, ttl=3600)
+    rng = random.Random(seed)
+    version = seed
+    while time.time() < deadline:
+        key = f"k{rng.randrange(keys)}"
+        roll = rng.random()
+        if roll < 0.001:
+            table.clear()
+        elif roll < 0.05:
+            table.pop(key)
+        else:
+            version += 1
+            table[key] = (make_value(key, version), math.inf if roll < 0.5 else time.monotonic() + 60)
+    table.close()
+
+
+def reader(path: str, slots: int, keys: int, deadline: float, seed: int, results):
+    table = SharedURLTable(path, slots, SLOT_BYTES, ttl=3600)
+    rng = random.Random(seed)
+    reads = hits = torn = 0
+    while time.time() < deadline:
+        key = f"k{rng.randrange(keys)}"
+        entry = table.get(key)
+        reads += 1
+        if entry is not None:
+            hits += 1
+            if not is_consistent(key, entry[0]):
+                torn += 1
+                if torn <= 5:
+                    print(f"torn read of {key}: {entry[0]!r}", file=sys.stderr, flush=True)
+    table.close()
+    results.put((reads, hits, torn))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--keys", type=int, default=256)
+    parser.add_argument("--slots", type=int, default=128)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.gettempdir(), f"url-shortener-l1-stress-{os.getpid()}")
+    # Created up front so no process sees a layout mismatch while the others start
+    SharedURLTable(path, args.slots, SLOT_BYTES, ttl=3600).close()
+    deadline = time.time() + args.seconds
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=writer, args=(path, args.slots, args.keys, deadline, index))
+        for index in range(args.writers)
+    ] + [
+        multiprocessing.Process(target=reader, args=(path, args.slots, args.keys, deadline, 1000 + index, results))
+        for index in range(args.readers)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        totals = [0, 0, 0]
+        for _ in range(args.readers):
+            for index, value in enumerate(results.get()):
+                totals[index] += value
+        for process in processes:
+            process.join()
+    finally:
+        os.unlink(path)
+
+    reads, hits, torn = totals
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s: "
+          f"{reads} reads, {hits} hits, {torn} torn")
+    failed = [process for process in processes if process.exitcode != 0]
+    sys.exit(1 if torn or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import bisect
+import random
+from itertools import accumulate
+
+
+class ZipfianGenerator:
+    """Seeded Zipf(s) sampler over ranks 0..n-1: rank 0 is the most popular item"""
+
+    def __init__(self, n: int, s: float = 1.1, seed: int = 0):
+        self.n = n
+        self.s = s
+        self.cdf = list(accumulate(1.0 / (rank + 1) ** s for rank in range(n)))
+        self.rng = random.Random(seed)
+
+    def next(self) -> int:
+        return min(bisect.bisect_left(self.cdf, self.rng.random() * self.cdf[-1]), self.n - 1)
+
+    def sample(self, count: int) -> list[int]:
+        return [self.next() for _ in range(count)]
@@ -4,6 +4,8 @@ const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/a
 
 export const api = axios.create({
   baseURL: API_BASE_URL,
+  // Sends the API's read_primary cookie, so lists right after a create see the new link
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },